@@ -0,0 +1,530 @@
+# aggregates.py
+"""
+Incrementally maintained aggregates over Transactions.
+
+Every write path (POST/PUT/DELETE /transactions, POST /income, POST /expense,
+POST /transactions/bulk) calls apply_transaction_deltas() with the rows it
+removed and/or added, on the same cursor and before the same commit, so the
+aggregates always move together with the data.
+
+Rows are dicts with: amount, type ('income' | 'expense'), date, category_id.
+
+Maintained tables:
+- UserSummaries: per-user totals behind GET /dashboard
+- MonthlyRollups: (user_id, year, month, category_id, type) -> total, txn_count,
+  read by budgets, budget alerts and charts. category_id 0 stands for
+  "no category" so it can be part of the primary key.
+- DailyRollups: (user_id, day, type) -> total, txn_count, behind the
+  day/week income vs expense chart.
+
+UserSummaries.data_version is bumped on every write; readers use it as a
+cheap cross-process cache key (see user_data_version()).
+
+Signup creates the user's (empty) UserSummaries row. A user without one,
+e.g. from before the aggregate tables existed, is seeded from Transactions
+by seed_user_aggregates(): write routes call ensure_user_aggregates()
+before they open their transaction, and GET /dashboard seeds on read.
+
+Once the rollups are updated, the budgets of every month that gained or
+lost an expense are re-checked against the alert thresholds
+(budget_engine.evaluate_budget_thresholds), in the same transaction.
+"""
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+
+from budget_engine import evaluate_budget_thresholds
+from db import get_connection
+
+UNCATEGORIZED = 0
+SEED_LOCK_TIMEOUT = 10  # seconds to wait for another request seeding the same user
+
+_seeded_users = set()  # users known to have aggregates, per process
+
+
+def _amount(row):
+    return Decimal(str(row["amount"]))
+
+
+def _summary_delta(removed, added):
+    income = Decimal("0")
+    expense = Decimal("0")
+    count = 0
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            amount = _amount(row) * sign
+            if row["type"] == "income":
+                income += amount
+            else:
+                expense += amount
+            count += sign
+    return income, expense, count
+
+
+def _day_of(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    return value
+
+
+def _monthly_key(row):
+    day = _day_of(row["date"])
+    return (day.year, day.month, int(row.get("category_id") or UNCATEGORIZED), row["type"])
+
+
+def _daily_key(row):
+    return (_day_of(row["date"]), row["type"])
+
+
+def _grouped_delta(removed, added, key_of):
+    """{key: (amount_delta, count_delta)}, zero entries dropped."""
+    deltas = defaultdict(lambda: [Decimal("0"), 0])
+    for rows, sign in ((removed, -1), (added, 1)):
+        for row in rows:
+            key = key_of(row)
+            deltas[key][0] += _amount(row) * sign
+            deltas[key][1] += sign
+    return {key: tuple(v) for key, v in deltas.items() if v[0] or v[1]}
+
+
+def apply_transaction_deltas(cursor, user_id, removed=(), added=()):
+    """
+    Applies the effect of deleting `removed` and inserting `added`
+    to the user's aggregates. Does not commit.
+    """
+    removed = list(removed)
+    added = list(added)
+    if not removed and not added:
+        return
+
+    if not _apply_summary_delta(cursor, user_id, removed, added):
+        # Not seeded (the route skipped ensure_user_aggregates, or the row was
+        # wiped). Seeding here would wait on this transaction's own locks, so
+        # fail the write; the next one seeds first.
+        _seeded_users.discard(user_id)
+        raise RuntimeError(f"Aggregates for user {user_id} are not seeded")
+    _apply_rollup_delta(cursor, user_id, removed, added)
+    _apply_daily_delta(cursor, user_id, removed, added)
+
+    expense_months = {
+        (day.year, day.month)
+        for day in (_day_of(row["date"]) for row in removed + added if row["type"] == "expense")
+    }
+    evaluate_budget_thresholds(cursor, user_id, expense_months)
+
+
+def _apply_summary_delta(cursor, user_id, removed, added):
+    """Returns False when the user has no summary row yet."""
+    income, expense, count = _summary_delta(removed, added)
+
+    # data_version always changes, so rowcount is 0 only for a missing row
+    cursor.execute(
+        """
+        UPDATE UserSummaries
+        SET total_income = total_income + %s,
+            total_expense = total_expense + %s,
+            transaction_count = transaction_count + %s,
+            data_version = data_version + 1
+        WHERE user_id = %s
+        """,
+        (income, expense, count, user_id),
+    )
+    return cursor.rowcount > 0
+
+
+def _apply_rollup_delta(cursor, user_id, removed, added):
+    deltas = _grouped_delta(removed, added, _monthly_key)
+    if not deltas:
+        return
+
+    cursor.executemany(
+        """
+        INSERT INTO MonthlyRollups (user_id, year, month, category_id, type, total, txn_count)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total = total + VALUES(total),
+            txn_count = txn_count + VALUES(txn_count)
+        """,
+        [
+            (user_id, year, month, category_id, type_, amount, count)
+            for (year, month, category_id, type_), (amount, count) in sorted(deltas.items())
+        ],
+    )
+
+    emptied = [
+        (user_id, year, month, category_id, type_)
+        for (year, month, category_id, type_), (_, count) in deltas.items()
+        if count < 0
+    ]
+    if emptied:
+        cursor.executemany(
+            """
+            DELETE FROM MonthlyRollups
+            WHERE user_id = %s AND year = %s AND month = %s
+              AND category_id = %s AND type = %s
+              AND txn_count <= 0
+            """,
+            emptied,
+        )
+
+
+def _apply_daily_delta(cursor, user_id, removed, added):
+    deltas = _grouped_delta(removed, added, _daily_key)
+    if not deltas:
+        return
+
+    cursor.executemany(
+        """
+        INSERT INTO DailyRollups (user_id, day, type, total, txn_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total = total + VALUES(total),
+            txn_count = txn_count + VALUES(txn_count)
+        """,
+        [
+            (user_id, day, type_, amount, count)
+            for (day, type_), (amount, count) in sorted(deltas.items())
+        ],
+    )
+
+    emptied = [
+        (user_id, day, type_)
+        for (day, type_), (_, count) in deltas.items()
+        if count < 0
+    ]
+    if emptied:
+        cursor.executemany(
+            """
+            DELETE FROM DailyRollups
+            WHERE user_id = %s AND day = %s AND type = %s
+              AND txn_count <= 0
+            """,
+            emptied,
+        )
+
+
+def ensure_user_aggregates(user_id):
+    """
+    Seeds the user's aggregates unless they exist. Write routes call it
+    before opening their own transaction: once that transaction has touched
+    the missing UserSummaries key, a seed on a second connection of the
+    same thread would wait on its gap lock, a wait InnoDB cannot detect.
+    """
+    if user_id in _seeded_users:
+        return
+    seed_user_aggregates(user_id)
+    _seeded_users.add(user_id)
+
+
+def seed_user_aggregates(user_id):
+    """
+    Builds a user's aggregates from Transactions, once, on a connection of
+    its own, and commits. Concurrent first requests for the same user queue
+    on a GET_LOCK and find the work done. The calling thread must not hold
+    an open transaction on the user's rows (see ensure_user_aggregates).
+
+    It writes exact-key upserts and deletes rather than DELETE +
+    INSERT ... SELECT, whose gap locks deadlocked concurrent seeds.
+    """
+    conn = get_connection()
+    cursor = conn.cursor()
+    lock_name = f"mymoneypal.aggregates.seed.{user_id}"
+    try:
+        cursor.execute("SELECT 1 FROM UserSummaries WHERE user_id = %s", (user_id,))
+        seeded = cursor.fetchone() is not None
+        conn.commit()
+        if seeded:
+            return
+
+        cursor.execute("SELECT GET_LOCK(%s, %s)", (lock_name, SEED_LOCK_TIMEOUT))
+        if cursor.fetchone()[0] != 1:
+            raise RuntimeError(f"Timed out waiting to seed aggregates for user {user_id}")
+        try:
+            cursor.execute("SELECT 1 FROM UserSummaries WHERE user_id = %s", (user_id,))
+            if cursor.fetchone() is None:
+                _seed_summary(cursor, user_id)
+                _seed_rollups(
+                    cursor, user_id, "MonthlyRollups", ("year", "month", "category_id", "type"),
+                    f"""
+                    SELECT YEAR(date), MONTH(date), COALESCE(category_id, {UNCATEGORIZED}), type,
+                           SUM(amount), COUNT(*)
+                    FROM Transactions
+                    WHERE user_id = %s
+                    GROUP BY YEAR(date), MONTH(date), COALESCE(category_id, {UNCATEGORIZED}), type
+                    """,
+                )
+                _seed_rollups(
+                    cursor, user_id, "DailyRollups", ("day", "type"),
+                    """
+                    SELECT date, type, SUM(amount), COUNT(*)
+                    FROM Transactions
+                    WHERE user_id = %s
+                    GROUP BY date, type
+                    """,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute("SELECT RELEASE_LOCK(%s)", (lock_name,))
+            cursor.fetchone()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _seed_summary(cursor, user_id):
+    cursor.execute(
+        """
+        SELECT
+            COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0),
+            COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0),
+            COUNT(*)
+        FROM Transactions
+        WHERE user_id = %s
+        """,
+        (user_id,),
+    )
+    income, expense, count = cursor.fetchone()
+    cursor.execute(
+        """
+        INSERT INTO UserSummaries (user_id, total_income, total_expense, transaction_count)
+        VALUES (%s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+            total_income = VALUES(total_income),
+            total_expense = VALUES(total_expense),
+            transaction_count = VALUES(transaction_count),
+            data_version = data_version + 1
+        """,
+        (user_id, income, expense, count),
+    )
+
+
+def _seed_rollups(cursor, user_id, table, key_columns, source_sql):
+    """Sets `table` for one user to the rows of `source_sql` (key..., total, txn_count)."""
+    cursor.execute(source_sql, (user_id,))
+    rows = [tuple(row) for row in cursor.fetchall()]
+    keys = ", ".join(key_columns)
+
+    cursor.execute(f"SELECT {keys} FROM {table} WHERE user_id = %s", (user_id,))
+    fresh = {row[:len(key_columns)] for row in rows}
+    stale = [(user_id, *key) for key in map(tuple, cursor.fetchall()) if key not in fresh]
+
+    if rows:
+        cursor.executemany(
+            f"""
+            INSERT INTO {table} (user_id, {keys}, total, txn_count)
+            VALUES (%s, {", ".join(["%s"] * len(key_columns))}, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                total = VALUES(total),
+                txn_count = VALUES(txn_count)
+            """,
+            [(user_id, *row) for row in sorted(rows)],
+        )
+    if stale:
+        cursor.executemany(
+            f"""
+            DELETE FROM {table}
+            WHERE user_id = %s AND {" AND ".join(f"{c} = %s" for c in key_columns)}
+            """,
+            stale,
+        )
+
+
+def reassign_category_rollups(cursor, category_id):
+    """
+    Categories are deleted with ON DELETE SET NULL on Transactions, so fold
+    the category's rollup rows into the uncategorized bucket. Does not commit.
+    """
+    cursor.execute(
+        """
+        INSERT INTO MonthlyRollups (user_id, year, month, category_id, type, total, txn_count)
+        SELECT src.user_id, src.year, src.month, %s, src.type, src.moved_total, src.moved_count
+        FROM (
+            SELECT user_id, year, month, type,
+                   total AS moved_total, txn_count AS moved_count
+            FROM MonthlyRollups
+            WHERE category_id = %s
+        ) AS src
+        ON DUPLICATE KEY UPDATE
+            total = total + src.moved_total,
+            txn_count = txn_count + src.moved_count
+        """,
+        (UNCATEGORIZED, category_id),
+    )
+    cursor.execute("DELETE FROM MonthlyRollups WHERE category_id = %s", (category_id,))
+
+
+def rebuild_user_aggregates(cursor, user_id=None):
+    """Recomputes every aggregate table, for one user or for everyone. Does not commit."""
+    rebuild_user_summaries(cursor, user_id)
+    rebuild_monthly_rollups(cursor, user_id)
+    rebuild_daily_rollups(cursor, user_id)
+
+
+def rebuild_monthly_rollups(cursor, user_id=None):
+    """
+    Recomputes MonthlyRollups from Transactions, for one user or for everyone.
+    Does not commit.
+    """
+    user_filter = "WHERE user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    cursor.execute(f"DELETE FROM MonthlyRollups {user_filter}", params)
+    cursor.execute(
+        f"""
+        INSERT INTO MonthlyRollups (user_id, year, month, category_id, type, total, txn_count)
+        SELECT
+            user_id,
+            YEAR(date),
+            MONTH(date),
+            COALESCE(category_id, {UNCATEGORIZED}),
+            type,
+            SUM(amount),
+            COUNT(*)
+        FROM Transactions
+        {user_filter}
+        GROUP BY user_id, YEAR(date), MONTH(date), COALESCE(category_id, {UNCATEGORIZED}), type
+        """,
+        params,
+    )
+
+
+def rebuild_daily_rollups(cursor, user_id=None):
+    """Recomputes DailyRollups from Transactions. Does not commit."""
+    user_filter = "WHERE user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    cursor.execute(f"DELETE FROM DailyRollups {user_filter}", params)
+    cursor.execute(
+        f"""
+        INSERT INTO DailyRollups (user_id, day, type, total, txn_count)
+        SELECT user_id, date, type, SUM(amount), COUNT(*)
+        FROM Transactions
+        {user_filter}
+        GROUP BY user_id, date, type
+        """,
+        params,
+    )
+
+
+def rebuild_user_summaries(cursor, user_id=None):
+    """
+    Recomputes UserSummaries from scratch, for one user or for everyone.
+    Rows are reset and upserted rather than deleted, so data_version keeps
+    increasing and cached read models are invalidated. Does not commit.
+    """
+    user_filter = "WHERE user_id = %s" if user_id is not None else ""
+    params = (user_id,) if user_id is not None else ()
+
+    cursor.execute(
+        f"""
+        UPDATE UserSummaries
+        SET total_income = 0,
+            total_expense = 0,
+            transaction_count = 0,
+            data_version = data_version + 1
+        {user_filter}
+        """,
+        params,
+    )
+
+    if user_id is not None:
+        cursor.execute(
+            """
+            INSERT INTO UserSummaries (user_id, total_income, total_expense, transaction_count)
+            SELECT src.user_id, src.income, src.expense, src.cnt
+            FROM (
+                SELECT
+                    %s AS user_id,
+                    COALESCE(SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END), 0) AS income,
+                    COALESCE(SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END), 0) AS expense,
+                    COUNT(*) AS cnt
+                FROM Transactions
+                WHERE user_id = %s
+            ) AS src
+            ON DUPLICATE KEY UPDATE
+                total_income = src.income,
+                total_expense = src.expense,
+                transaction_count = src.cnt
+            """,
+            (user_id, user_id),
+        )
+    else:
+        cursor.execute(
+            """
+            INSERT INTO UserSummaries (user_id, total_income, total_expense, transaction_count)
+            SELECT src.user_id, src.income, src.expense, src.cnt
+            FROM (
+                SELECT
+                    user_id,
+                    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END) AS income,
+                    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END) AS expense,
+                    COUNT(*) AS cnt
+                FROM Transactions
+                GROUP BY user_id
+            ) AS src
+            ON DUPLICATE KEY UPDATE
+                total_income = src.income,
+                total_expense = src.expense,
+                transaction_count = src.cnt
+            """
+        )
+
+
+def touch_user_data(cursor, user_id):
+    """Bumps data_version for changes outside Transactions (e.g. a category rename). Does not commit."""
+    cursor.execute(
+        "UPDATE UserSummaries SET data_version = data_version + 1 WHERE user_id = %s",
+        (user_id,),
+    )
+
+
+def user_data_version(cursor, user_id):
+    """
+    Returns the user's write counter (None if never seeded). Cached read
+    models store it next to the value and recompute once it moves.
+    """
+    cursor.execute("SELECT data_version FROM UserSummaries WHERE user_id = %s", (user_id,))
+    row = cursor.fetchone()
+    if row is None:
+        return None
+    return row["data_version"] if isinstance(row, dict) else row[0]
+
+
+def get_user_summary(conn, user_id):
+    """
+    O(1) primary-key read of the user's totals.
+
+    Returns:
+        (total_income, total_expenses, transaction_count)
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT total_income, total_expense, transaction_count
+        FROM UserSummaries
+        WHERE user_id = %s
+        """,
+        (user_id,),
+    )
+    row = cursor.fetchone()
+
+    if row is None:
+        # Never seeded yet: build it once so later reads are O(1). End this
+        # connection's snapshot first so the re-read sees the seeded row.
+        conn.commit()
+        seed_user_aggregates(user_id)
+        cursor.execute(
+            """
+            SELECT total_income, total_expense, transaction_count
+            FROM UserSummaries
+            WHERE user_id = %s
+            """,
+            (user_id,),
+        )
+        row = cursor.fetchone()
+
+    cursor.close()
+    return row
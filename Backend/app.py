@@ -1,12 +1,18 @@
 # app.py
 import os
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
 
-from apscheduler.schedulers.background import BackgroundScheduler
-
-from db import get_connection
+from db import get_connection, pool_stats
+from aggregates import rebuild_user_aggregates
+from outbox import drain_outbox, outbox_stats
+from job_runner import job_progress
+from pubsub import hub as notification_hub
+from auth_utils import token_cache
+from passwords import hashing_stats
+from revocation import revocation_stats
 
 
 load_dotenv()
@@ -16,6 +22,7 @@ from routes.signup import signup_bp
 from routes.login import login_bp
 from routes.forgot_password import forgot_bp
 from routes.logout import logout_bp
+from routes.refresh_token import refresh_bp
 from routes.income import income_bp
 from routes.expense import expense_bp
 from routes.dashboard import dashboard_bp
@@ -31,17 +38,20 @@ from routes.goal_reminders import check_and_send_goal_reminders
 from routes.budget_alerts import budget_alerts_bp, check_and_send_budget_alerts
 from routes.notifications import notifications_bp
 
+from scheduler import start_schedulers, scheduler_status
+
 
 
 app = Flask(__name__)
 app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret")
-CORS(app)
+CORS(app, expose_headers=["X-Next-Cursor"])
 
 
 app.register_blueprint(signup_bp)
 app.register_blueprint(login_bp)
 app.register_blueprint(forgot_bp)
 app.register_blueprint(logout_bp)
+app.register_blueprint(refresh_bp)
 app.register_blueprint(income_bp)
 app.register_blueprint(expense_bp)
 app.register_blueprint(dashboard_bp)
@@ -62,62 +72,59 @@ def home():
 
 
 
-# Automated email scheduler
+# Automated email jobs run in the elected scheduler process (see scheduler.py)
 
-_scheduler = None
+@app.route("/debug/scheduler")
+def debug_scheduler():
+    return jsonify(scheduler_status()), 200
 
-def start_schedulers():
-    """
-    Starts APScheduler jobs.
-    - Goal reminders: every 1 minute (for testing)
-    - Budget alerts: daily at 19:00 (Asia/Karachi)
-    """
-    global _scheduler
-    if _scheduler and _scheduler.running:
-        return  
 
-    _scheduler = BackgroundScheduler(timezone="Asia/Karachi")
+@app.route("/debug/send-goal-reminders", methods=["POST"])
+def debug_send_goal_reminders_api():
+    queued = check_and_send_goal_reminders()
+    return jsonify({"queued": queued}), 200
 
-    #  Savings goals -> 7:00 PM
-    _scheduler.add_job(
-        check_and_send_goal_reminders,
-        trigger="cron",
-        hour = 19,
-        minute=0,
-        id="goal_reminder_job",
-        replace_existing=True,
-        max_instances=1,
-        coalesce=True,
-    )
 
-    #  Budget alerts → 7:00 PM
-    _scheduler.add_job(
-        check_and_send_budget_alerts,
-        trigger="cron",
-        hour=19,
-        minute=0,
-        id="budget_alert_job",
-        replace_existing=True,
-        max_instances=1,
-        coalesce=True,
-    )
+@app.route("/debug/send-budget-alerts", methods=["POST"])
+def debug_send_budget_alerts_api():
+    queued = check_and_send_budget_alerts()
+    return jsonify({"queued": queued}), 200
 
-    _scheduler.start()
-    print("✔ Automatic Email Schedulers Started")
 
+@app.route("/debug/drain-outbox", methods=["POST"])
+def debug_drain_outbox_api():
+    sent = drain_outbox()
+    return jsonify({"sent": sent}), 200
 
 
+@app.route("/debug/jobs/<job_name>")
+def debug_job_progress(job_name):
+    return jsonify(job_progress(job_name)), 200
 
-@app.route("/debug/send-goal-reminders", methods=["POST"])
-def debug_send_goal_reminders_api():
-    sent = check_and_send_goal_reminders()
-    return jsonify({"sent": sent}), 200
 
+@app.route("/debug/notification-stream")
+def debug_notification_stream():
+    return jsonify(notification_hub.stats()), 200
 
-@app.route("/debug/send-budget-alerts", methods=["POST"])
-def debug_send_budget_alerts_api():
-    sent = check_and_send_budget_alerts()
-    return jsonify({"sent": sent}), 200
+
+@app.route("/debug/token-cache")
+def debug_token_cache():
+    return jsonify(token_cache.stats()), 200
+
+
+@app.route("/debug/revocations")
+def debug_revocations():
+    return jsonify(revocation_stats()), 200
+
+
+@app.route("/debug/hashing")
+def debug_hashing():
+    return jsonify(hashing_stats()), 200
+
+
+@app.route("/debug/outbox")
+def debug_outbox():
+    return jsonify(outbox_stats()), 200
 
 
 @app.route("/test-db")
@@ -134,8 +141,29 @@ def test_db():
         return jsonify({"error": str(e)}), 500
 
 
+# Maintenance commands (flask --app app <command>)
+
+@app.cli.command("rebuild-aggregates")
+@click.option("--user-id", type=int, default=None, help="Only rebuild this user")
+def rebuild_aggregates_command(user_id):
+    """Recompute UserSummaries and MonthlyRollups from the Transactions table."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    rebuild_user_aggregates(cursor, user_id)
+    conn.commit()
+    cursor.close()
+    conn.close()
+    click.echo("✔ Aggregates rebuilt")
+
+
+@app.route("/debug/db-pool")
+def debug_db_pool():
+    return jsonify(pool_stats()), 200
+
+
 if __name__ == "__main__":
-    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+    # Dev server convenience; in production run `python worker.py` instead
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true" and os.getenv("RUN_SCHEDULER", "1") == "1":
         start_schedulers()
 
     app.run(debug=True)
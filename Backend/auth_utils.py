@@ -1,17 +1,22 @@
 # auth_utils.py
-from flask import request, current_app
+import functools
+import hashlib
+import os
+import time
+
+from flask import request, current_app, jsonify
 import jwt
 
+from cache import LRUCache
+from revocation import is_revoked
 
-def get_user_id_from_token():
-    """
-    Common helper to extract user_id from Authorization: Bearer <token>.
+# Already-verified tokens: sha256(token) -> (user_id, exp, jti). Repeated
+# requests from the same session skip the HS256 signature check until the
+# token expires; revocation is still checked on every request.
+token_cache = LRUCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000")))
 
-    Returns:
-        (user_id, error_message)
-        - user_id: int or None
-        - error_message: None if OK, otherwise a string
-    """
+
+def _token_from_request():
     auth_header = request.headers.get("Authorization")
     if not auth_header:
         return None, "Missing Authorization header"
@@ -19,11 +24,73 @@ def get_user_id_from_token():
     parts = auth_header.split()
     if len(parts) != 2 or parts[0] != "Bearer":
         return None, "Invalid Authorization header format"
+    return parts[1], None
+
+
+def verify_token(token):
+    """
+    Returns (user_id, error_message) for a raw JWT, consulting the
+    verified-token cache first. Only tokens carrying exp are cached, and a
+    cached entry is dropped as soon as exp has passed. Tokens revoked by
+    logout are rejected whether cached or not (an in-memory lookup).
+    """
+    key = hashlib.sha256(token.encode("utf-8")).hexdigest()
+    cached = token_cache.get(key)
+    if cached is not None:
+        user_id, exp, jti = cached
+        if exp > time.time():
+            if is_revoked(jti):
+                return None, "Token has been revoked"
+            return user_id, None
+        token_cache.pop(key)
 
-    token = parts[1]
     try:
         secret = current_app.config["SECRET_KEY"]
         decoded = jwt.decode(token, secret, algorithms=["HS256"])
-        return decoded["user_id"], None
+        user_id = decoded["user_id"]
     except Exception:
         return None, "Invalid or expired token"
+
+    jti = decoded.get("jti")
+    if is_revoked(jti):
+        return None, "Token has been revoked"
+
+    if "exp" in decoded:
+        token_cache.set(key, (user_id, float(decoded["exp"]), jti))
+    return user_id, None
+
+
+def get_user_id_from_token():
+    """
+    Common helper to extract user_id from Authorization: Bearer <token>.
+
+    Returns:
+        (user_id, error_message)
+        - user_id: int or None
+        - error_message: None if OK, otherwise a string
+    """
+    token, error = _token_from_request()
+    if error:
+        return None, error
+    return verify_token(token)
+
+
+def login_required(view=None):
+    """
+    Route decorator: rejects the request with 401 unless it carries a valid
+    token, otherwise calls the view with user_id=<id> added to its kwargs.
+
+        @bp.route("/things/<int:thing_id>")
+        @login_required
+        def get_thing(thing_id, user_id): ...
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            user_id, error = get_user_id_from_token()
+            if error:
+                return jsonify({"error": error}), 401
+            return fn(*args, user_id=user_id, **kwargs)
+        return wrapper
+
+    return decorator(view) if view is not None else decorator
@@ -0,0 +1,167 @@
+# benchmarks/bench_budgets.py
+"""
+Compares GET /budgets spend strategies on a synthetic user.
+
+    cd Backend
+    python benchmarks/bench_budgets.py --transactions 100000 --months 24
+
+Needs the usual DB_* settings in .env. Creates a throwaway user, seeds
+transactions and budgets, times each strategy, then deletes the user
+(everything else is removed by ON DELETE CASCADE).
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import uuid
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import get_connection  # noqa: E402
+from aggregates import rebuild_user_aggregates  # noqa: E402
+from budget_engine import attach_budget_spend  # noqa: E402
+
+LEGACY_SQL = """
+    SELECT b.budget_id, COALESCE(SUM(t.amount), 0) AS spent_total
+    FROM Budgets b
+    LEFT JOIN Transactions t
+      ON t.user_id = b.user_id
+     AND (t.category_id = b.category_id OR b.category_id IS NULL)
+     AND MONTH(t.date) = b.month
+     AND YEAR(t.date) = b.year
+     AND t.type = 'expense'
+    WHERE b.user_id = %s
+    GROUP BY b.budget_id
+"""
+
+
+def seed(conn, n_transactions, n_months, n_categories):
+    cur = conn.cursor()
+    tag = uuid.uuid4().hex[:10]
+    cur.execute(
+        """
+        INSERT INTO Users (username, email, password, security_question, security_answer)
+        VALUES (%s, %s, 'x', 'favorite_color', 'x')
+        """,
+        (f"bench_{tag}", f"bench_{tag}@example.com"),
+    )
+    user_id = cur.lastrowid
+
+    cur.executemany(
+        "INSERT INTO Categories (user_id, name, type) VALUES (%s, %s, 'expense')",
+        [(user_id, f"Bench {i}") for i in range(n_categories)],
+    )
+    cur.execute("SELECT category_id FROM Categories WHERE user_id = %s", (user_id,))
+    category_ids = [row[0] for row in cur.fetchall()]
+
+    today = date.today()
+    months = []
+    y, m = today.year, today.month
+    for _ in range(n_months):
+        months.append((y, m))
+        y, m = (y - 1, 12) if m == 1 else (y, m - 1)
+
+    rng = random.Random(42)
+    batch = []
+    for _ in range(n_transactions):
+        y, m = rng.choice(months)
+        batch.append((
+            user_id,
+            rng.choice(category_ids),
+            round(rng.uniform(1, 500), 2),
+            date(y, m, rng.randint(1, 28)),
+            rng.choice(("expense", "expense", "expense", "income")),
+        ))
+        if len(batch) == 5000:
+            cur.executemany(
+                "INSERT INTO Transactions (user_id, category_id, amount, date, type) VALUES (%s, %s, %s, %s, %s)",
+                batch,
+            )
+            batch = []
+    if batch:
+        cur.executemany(
+            "INSERT INTO Transactions (user_id, category_id, amount, date, type) VALUES (%s, %s, %s, %s, %s)",
+            batch,
+        )
+
+    budgets = [(user_id, cid, 1000, m, y) for (y, m) in months for cid in category_ids + [None]]
+    cur.executemany(
+        "INSERT INTO Budgets (user_id, category_id, amount_limit, month, year) VALUES (%s, %s, %s, %s, %s)",
+        budgets,
+    )
+
+    rebuild_user_aggregates(cur, user_id)
+    conn.commit()
+    cur.close()
+    return user_id, len(budgets)
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transactions", type=int, default=100_000)
+    parser.add_argument("--months", type=int, default=24)
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    conn = get_connection()
+    print(f"Seeding {args.transactions} transactions over {args.months} months ...")
+    user_id, n_budgets = seed(conn, args.transactions, args.months, args.categories)
+
+    try:
+        cur = conn.cursor(dictionary=True)
+        cur.execute(
+            "SELECT budget_id, category_id, month, year FROM Budgets WHERE user_id = %s",
+            (user_id,),
+        )
+        budgets = cur.fetchall()
+
+        def legacy():
+            cur.execute(LEGACY_SQL, (user_id,))
+            return {r["budget_id"]: float(r["spent_total"]) for r in cur.fetchall()}
+
+        def engine(source):
+            def run():
+                rows = [dict(b) for b in budgets]
+                attach_budget_spend(cur, user_id, rows, source=source)
+                return {r["budget_id"]: r["spent_total"] for r in rows}
+            return run
+
+        results = [
+            ("legacy join (budgets x transactions)", *timed(legacy, args.repeat)),
+            ("grouped pass over Transactions", *timed(engine("transactions"), args.repeat)),
+            ("grouped pass over MonthlyRollups", *timed(engine("rollups"), args.repeat)),
+        ]
+
+        print(f"\n{n_budgets} budgets, {args.transactions} transactions (best of {args.repeat})")
+        baseline = results[0][1]
+        for name, seconds, _ in results:
+            print(f"  {name:<40} {seconds * 1000:10.1f} ms   x{baseline / seconds:7.1f}")
+
+        reference = results[0][2]
+        for name, _, spend in results[1:]:
+            mismatched = [b for b, v in reference.items() if abs(spend.get(b, 0.0) - v) > 0.01]
+            print(f"  {name}: {'OK' if not mismatched else f'{len(mismatched)} budgets differ'}")
+        cur.close()
+    finally:
+        cleanup = conn.cursor()
+        cleanup.execute("DELETE FROM Users WHERE user_id = %s", (user_id,))
+        conn.commit()
+        cleanup.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
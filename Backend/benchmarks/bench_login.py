@@ -0,0 +1,154 @@
+# benchmarks/bench_login.py
+"""
+Login throughput against the bcrypt cost factor.
+
+    cd Backend
+    python benchmarks/bench_login.py --costs 10,11,12,13 --requests 200 --concurrency 16
+
+Needs the usual DB_* settings in .env. For each cost it creates a throwaway
+user hashed at that cost, fires POST /login from `concurrency` threads
+through the Flask test client, and reports logins/second, p50/p95 latency
+and how many requests were shed with 429/503. It also times a plain
+GET /notifications/unread-count issued alongside the logins, to show how much
+the hashing load slows cheap endpoints. The users are deleted afterwards.
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bcrypt  # noqa: E402
+
+import passwords  # noqa: E402
+from app import app  # noqa: E402
+from db import get_connection  # noqa: E402
+
+PASSWORD = "bench-password"
+
+
+def create_user(conn, cost):
+    cur = conn.cursor()
+    tag = uuid.uuid4().hex[:10]
+    email = f"bench_{tag}@example.com"
+    hashed = bcrypt.hashpw(PASSWORD.encode("utf-8"), bcrypt.gensalt(cost)).decode("utf-8")
+    cur.execute(
+        """
+        INSERT INTO Users (username, email, password, security_question, security_answer)
+        VALUES (%s, %s, %s, 'favorite_color', 'x')
+        """,
+        (f"bench_{tag}", email, hashed),
+    )
+    user_id = cur.lastrowid
+    conn.commit()
+    cur.close()
+    return user_id, email
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def run_cost(client, email, n_requests, concurrency):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    token = {}
+
+    def one(_):
+        started = time.perf_counter()
+        resp = client.post("/login", json={"email": email, "password": PASSWORD})
+        elapsed = time.perf_counter() - started
+        with lock:
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+            if resp.status_code == 200:
+                latencies.append(elapsed)
+                token.setdefault("value", resp.get_json()["token"])
+
+    # One login up front, so the pool is warm and there is a token for the probe
+    one(None)
+    latencies.clear()
+    statuses.clear()
+
+    probe = []
+    done = threading.Event()
+
+    def probe_loop():
+        if "value" not in token:
+            return
+        headers = {"Authorization": f"Bearer {token['value']}"}
+        while not done.is_set():
+            started = time.perf_counter()
+            client.get("/notifications/unread-count", headers=headers)
+            probe.append(time.perf_counter() - started)
+            time.sleep(0.05)
+
+    prober = threading.Thread(target=probe_loop, daemon=True)
+    prober.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(n_requests)))
+    wall = time.perf_counter() - started
+    done.set()
+    prober.join()
+
+    return {
+        "ok": statuses.get(200, 0),
+        "shed": statuses.get(429, 0) + statuses.get(503, 0),
+        "other": sum(v for k, v in statuses.items() if k not in (200, 429, 503)),
+        "rate": statuses.get(200, 0) / wall if wall else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": percentile(latencies, 0.95),
+        "probe_p95": percentile(probe, 0.95),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--costs", default="10,11,12,13")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    args = parser.parse_args()
+    costs = [int(c) for c in args.costs.split(",")]
+
+    conn = get_connection()
+    client = app.test_client()
+    users = []
+    try:
+        print(
+            f"{args.requests} logins per cost, {args.concurrency} concurrent, "
+            f"{passwords.HASH_WORKERS} hash workers, queue depth {passwords.HASH_QUEUE_DEPTH}\n"
+        )
+        print(f"  {'cost':>4} {'logins/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'shed':>6} {'other':>6} {'probe p95 ms':>13}")
+        for cost in costs:
+            # Hash and configured cost match, so no login triggers a rehash
+            passwords.BCRYPT_ROUNDS = cost
+            user_id, email = create_user(conn, cost)
+            users.append(user_id)
+            r = run_cost(client, email, args.requests, args.concurrency)
+            print(
+                f"  {cost:>4} {r['rate']:>9.1f} {r['p50'] * 1000:>8.1f} {r['p95'] * 1000:>8.1f} "
+                f"{r['shed']:>6} {r['other']:>6} {r['probe_p95'] * 1000:>13.1f}"
+            )
+    finally:
+        if users:
+            cleanup = conn.cursor()
+            cleanup.execute(
+                f"DELETE FROM Users WHERE user_id IN ({', '.join(['%s'] * len(users))})",
+                tuple(users),
+            )
+            conn.commit()
+            cleanup.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
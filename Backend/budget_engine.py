@@ -0,0 +1,250 @@
+# budget_engine.py
+"""
+Budget spend computation.
+
+Spend for a set of budgets is computed in one grouped pass over the months
+the budgets cover, then matched to budgets in Python:
+- a category budget gets the (year, month, category_id) total
+- an overall budget (category_id NULL) gets the sum over all categories for
+  its month, taken from the same pass
+
+The pass reads MonthlyRollups by default. source="transactions" runs the
+equivalent grouped query over Transactions with month start/end date ranges
+(used by the benchmark and to cross-check the rollups).
+
+Threshold alerts are evaluated on writes: every transaction write calls
+evaluate_budget_thresholds() (through aggregates.apply_transaction_deltas)
+for the months it touched, after MonthlyRollups has been updated, and so do
+budget creates/updates. Budgets.near_limit_sent holds the number of
+BUDGET_ALERT_THRESHOLDS already alerted for the budget; an alert fires only
+when spend climbs past a higher threshold, and the level drops back when
+spend falls (e.g. a deleted expense) so crossing it again alerts again.
+
+Only the in-app notification is written on the spot. The email waits for
+the user's send window (routes/budget_alerts.queue_budget_alert_emails),
+where it joins that window's digest: Budgets.alert_emailed_level trails
+near_limit_sent until then.
+"""
+import os
+from collections import defaultdict
+from datetime import date
+
+
+def _parse_thresholds(raw):
+    values = []
+    for part in raw.split(","):
+        try:
+            value = float(part)
+        except ValueError:
+            continue
+        if value > 0:
+            values.append(value)
+    return sorted(set(values)) or [0.8, 1.0]
+
+
+# Fractions of amount_limit that trigger an alert, e.g. "0.8,1.0"
+BUDGET_ALERT_THRESHOLDS = _parse_thresholds(os.getenv("BUDGET_ALERT_THRESHOLDS", "0.8,1.0"))
+
+
+def month_start(year, month):
+    return date(year, month, 1)
+
+
+def next_month_start(year, month):
+    return date(year + month // 12, month % 12 + 1, 1)
+
+
+def _spend_from_rollups(cursor, user_id, first, last):
+    cursor.execute(
+        """
+        SELECT year, month, category_id, SUM(total) AS spent
+        FROM MonthlyRollups
+        WHERE user_id = %s
+          AND type = 'expense'
+          AND (year > %s OR (year = %s AND month >= %s))
+          AND (year < %s OR (year = %s AND month <= %s))
+        GROUP BY year, month, category_id
+        """,
+        (user_id, first[0], first[0], first[1], last[0], last[0], last[1]),
+    )
+    return cursor.fetchall()
+
+
+def _spend_from_transactions(cursor, user_id, first, last):
+    cursor.execute(
+        """
+        SELECT
+            YEAR(date) AS year,
+            MONTH(date) AS month,
+            COALESCE(category_id, 0) AS category_id,
+            SUM(amount) AS spent
+        FROM Transactions
+        WHERE user_id = %s
+          AND type = 'expense'
+          AND date >= %s
+          AND date < %s
+        GROUP BY YEAR(date), MONTH(date), category_id
+        """,
+        (user_id, month_start(*first), next_month_start(*last)),
+    )
+    return cursor.fetchall()
+
+
+def spend_by_month(cursor, user_id, months, source="rollups"):
+    """
+    One grouped pass over the range spanned by `months` [(year, month), ...].
+
+    Returns:
+        {(year, month, category_id): spent} and {(year, month): spent_all_categories}
+    """
+    by_category = {}
+    by_month = defaultdict(float)
+    if not months:
+        return by_category, by_month
+
+    first, last = min(months), max(months)
+    loader = _spend_from_transactions if source == "transactions" else _spend_from_rollups
+    for row in loader(cursor, user_id, first, last):
+        row = row if isinstance(row, dict) else dict(zip(("year", "month", "category_id", "spent"), row))
+        spent = float(row["spent"] or 0)
+        by_category[(row["year"], row["month"], row["category_id"])] = spent
+        by_month[(row["year"], row["month"])] += spent
+    return by_category, by_month
+
+
+def attach_budget_spend(cursor, user_id, budgets, source="rollups"):
+    """
+    Sets budget["spent_total"] on each budget dict (needs year, month, category_id).
+    Issues a single query regardless of how many budgets there are.
+    """
+    months = {(b["year"], b["month"]) for b in budgets if b["year"] and b["month"]}
+    by_category, by_month = spend_by_month(cursor, user_id, months, source)
+
+    for b in budgets:
+        key = (b["year"], b["month"])
+        if b["category_id"] is None:
+            b["spent_total"] = round(by_month.get(key, 0.0), 2)
+        else:
+            b["spent_total"] = round(by_category.get(key + (b["category_id"],), 0.0), 2)
+    return budgets
+
+
+def threshold_level(spent, limit_amount):
+    """How many of BUDGET_ALERT_THRESHOLDS `spent` has reached."""
+    limit_amount = float(limit_amount or 0)
+    if limit_amount <= 0:
+        return 0
+    ratio = float(spent or 0) / limit_amount
+    return sum(1 for t in BUDGET_ALERT_THRESHOLDS if ratio >= t)
+
+
+def alert_message(spent, limit_amount, month, year):
+    """The in-app notification text for a budget alert."""
+    ratio = float(spent) / float(limit_amount)
+    return (
+        f"Budget alert: {ratio*100:.0f}% of your PKR {float(limit_amount):.2f} budget "
+        f"for {month:02d}/{year} used"
+    )
+
+
+def alert_content(username, spent, limit_amount, month, year):
+    """Returns (subject, body, notification message, digest summary)."""
+    spent = float(spent)
+    limit_amount = float(limit_amount)
+    ratio = spent / limit_amount
+    subject = f"⚠️ Budget Alert ({username}): {ratio*100:.0f}% used"
+    body = (
+        f"Hi {username},\n\n"
+        f"You have spent PKR {spent:.2f} out of PKR {limit_amount:.2f} "
+        f"for this month's budget.\n\n"
+        f"Usage: {ratio*100:.1f}%\n\n"
+        f"Please review your expenses.\n\n"
+        f"— My Money Pal"
+    )
+    message = alert_message(spent, limit_amount, month, year)
+    summary = (
+        f"PKR {spent:.2f} of PKR {limit_amount:.2f} spent "
+        f"for {month:02d}/{year} ({ratio*100:.0f}%)"
+    )
+    return subject, body, message, summary
+
+
+def claim_alert_level(cursor, budget_id, level):
+    """
+    Moves near_limit_sent up to `level`. Returns True only for the caller
+    that actually raised it, so concurrent writers never alert twice.
+    """
+    cursor.execute(
+        "UPDATE Budgets SET near_limit_sent = %s WHERE budget_id = %s AND near_limit_sent < %s",
+        (level, budget_id, level),
+    )
+    return cursor.rowcount == 1
+
+
+def _fetch_dicts(cursor):
+    rows = cursor.fetchall()
+    if rows and not isinstance(rows[0], dict):
+        rows = [dict(zip(cursor.column_names, row)) for row in rows]
+    return rows
+
+
+def evaluate_budget_thresholds(cursor, user_id, months):
+    """
+    Re-checks the user's budgets for `months` [(year, month), ...] against
+    the thresholds and logs an in-app alert for each newly crossed one; the
+    email follows in the user's send window. Must run after the rollups
+    reflect the write. Does not commit. Returns the number of alerts logged.
+    """
+    months = sorted(set(months))
+    if not months:
+        return 0
+
+    cursor.execute(
+        f"""
+        SELECT budget_id, category_id, amount_limit, month, year, near_limit_sent
+        FROM Budgets
+        WHERE user_id = %s
+          AND ({" OR ".join(["(year = %s AND month = %s)"] * len(months))})
+        """,
+        (user_id, *[v for ym in months for v in ym]),
+    )
+    budgets = _fetch_dicts(cursor)
+    if not budgets:
+        return 0
+
+    attach_budget_spend(cursor, user_id, budgets)
+
+    crossed = []
+    for b in budgets:
+        level = threshold_level(b["spent_total"], b["amount_limit"])
+        sent = b["near_limit_sent"] or 0
+        if level > sent:
+            if claim_alert_level(cursor, b["budget_id"], level):
+                crossed.append(b)
+        elif level < sent:
+            # Spend went back down: re-arm the thresholds above it, and
+            # drop any email for them that has not gone out yet
+            cursor.execute(
+                """
+                UPDATE Budgets
+                SET near_limit_sent = %s,
+                    alert_emailed_level = LEAST(alert_emailed_level, %s)
+                WHERE budget_id = %s
+                """,
+                (level, level, b["budget_id"]),
+            )
+
+    if not crossed:
+        return 0
+
+    cursor.executemany(
+        """
+        INSERT INTO Notifications (user_id, goal_id, message, type)
+        VALUES (%s, NULL, %s, 'budget_alert')
+        """,
+        [
+            (user_id, alert_message(b["spent_total"], b["amount_limit"], b["month"], b["year"]))
+            for b in crossed
+        ],
+    )
+    return len(crossed)
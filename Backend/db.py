@@ -1,14 +1,275 @@
 import mysql.connector
 import os
+import threading
+import time
 from dotenv import load_dotenv
 
 load_dotenv()
 
-def get_connection():
+
+# Pool settings (override in .env)
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_POOL_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+POOL_IDLE_TIMEOUT = float(os.getenv("DB_POOL_IDLE_TIMEOUT", "300"))
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+POOL_RESET_ON_RETURN = os.getenv("DB_POOL_RESET_ON_RETURN", "1") == "1"
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no connection becomes free within DB_POOL_TIMEOUT seconds."""
+
+
+def _connect():
     return mysql.connector.connect(
         host=os.getenv("DB_HOST"),
         user=os.getenv("DB_USER"),
         password=os.getenv("DB_PASSWORD"),
         database=os.getenv("DB_NAME"),
-        port=os.getenv("DB_PORT", 3306) 
+        port=os.getenv("DB_PORT", 3306)
     )
+
+
+class PooledConnection:
+    """
+    Thin proxy around a pooled mysql connection.
+    Behaves like the raw connection, except close() hands it back to the pool
+    instead of tearing down the socket. If a handler forgets to close it,
+    the connection is returned when the proxy is garbage collected.
+    """
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+
+    def close(self):
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._release(raw)
+
+    def invalidate(self):
+        """Closes the underlying connection instead of pooling it (e.g. after an aborted stream)."""
+        raw, self._raw = self._raw, None
+        if raw is not None:
+            self._pool._discard(raw)
+
+    def __getattr__(self, name):
+        if self._raw is None:
+            raise RuntimeError("Connection already returned to the pool")
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """
+    Thread-safe MySQL connection pool.
+
+    - keeps up to `size` idle connections, and allows `max_overflow` extra
+      connections under load (closed again when returned)
+    - callers block up to `timeout` seconds when everything is checked out
+    - idle connections older than `idle_timeout` are discarded on checkout
+    - `pre_ping` pings a connection before handing it out
+    - `reset_on_return` rolls back any open transaction when it comes back
+    """
+
+    def __init__(self, size=POOL_SIZE, max_overflow=POOL_MAX_OVERFLOW,
+                 timeout=POOL_TIMEOUT, idle_timeout=POOL_IDLE_TIMEOUT,
+                 pre_ping=POOL_PRE_PING, reset_on_return=POOL_RESET_ON_RETURN,
+                 connect=_connect):
+        self.size = size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.pre_ping = pre_ping
+        self.reset_on_return = reset_on_return
+        self._connect = connect
+
+        self._cond = threading.Condition()
+        self._idle = []          # [(raw_connection, returned_at)] used as a LIFO stack
+        self._open = 0           # connections currently alive (idle + checked out)
+
+        self._stats = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+        }
+
+    # checkout / checkin
+
+    def get(self):
+        deadline = None
+        waited_since = None
+
+        with self._cond:
+            while True:
+                raw = self._take_idle()
+                if raw is not None:
+                    break
+
+                if self._open < self.size + self.max_overflow:
+                    self._open += 1
+                    break
+
+                if waited_since is None:
+                    waited_since = time.monotonic()
+                    deadline = waited_since + self.timeout
+                    self._stats["waits"] += 1
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._stats["timeouts"] += 1
+                    self._stats["wait_time"] += time.monotonic() - waited_since
+                    raise PoolTimeoutError(
+                        f"No database connection available after {self.timeout:.0f}s"
+                    )
+                self._cond.wait(remaining)
+
+            if waited_since is not None:
+                self._stats["wait_time"] += time.monotonic() - waited_since
+            self._stats["checkouts"] += 1
+
+        # Network I/O happens outside the lock
+        if raw is not None and self.pre_ping and not self._is_alive(raw):
+            self._discard(raw, reserve_slot=True)
+            raw = None
+
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats["created"] += 1
+
+        return PooledConnection(self, raw)
+
+    def _take_idle(self):
+        """Pop the most recently used idle connection, dropping stale ones. Caller holds the lock."""
+        now = time.monotonic()
+        while self._idle:
+            raw, returned_at = self._idle.pop()
+            if self.idle_timeout and now - returned_at > self.idle_timeout:
+                self._open -= 1
+                self._stats["discarded"] += 1
+                self._close_quietly(raw)
+                continue
+            return raw
+        return None
+
+    def _release(self, raw):
+        if self.reset_on_return:
+            try:
+                if raw.in_transaction:
+                    raw.rollback()
+            except Exception:
+                self._discard(raw)
+                return
+
+        with self._cond:
+            if len(self._idle) < self.size:
+                self._idle.append((raw, time.monotonic()))
+                self._cond.notify()
+                return
+            # Overflow connection: close it instead of keeping it around
+            self._open -= 1
+            self._stats["discarded"] += 1
+            self._cond.notify()
+        self._close_quietly(raw)
+
+    def _discard(self, raw, reserve_slot=False):
+        """Close a broken connection. With reserve_slot the caller keeps its slot to reconnect."""
+        self._close_quietly(raw)
+        with self._cond:
+            self._stats["discarded"] += 1
+            if not reserve_slot:
+                self._open -= 1
+                self._cond.notify()
+
+    @staticmethod
+    def _is_alive(raw):
+        try:
+            raw.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close_quietly(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    # monitoring
+
+    def stats(self):
+        with self._cond:
+            idle = len(self._idle)
+            return {
+                "size": self.size,
+                "max_overflow": self.max_overflow,
+                "open": self._open,
+                "idle": idle,
+                "checked_out": self._open - idle,
+                "overflow": max(0, self._open - self.size),
+                "checkouts": self._stats["checkouts"],
+                "waits": self._stats["waits"],
+                "wait_time": round(self._stats["wait_time"], 4),
+                "timeouts": self._stats["timeouts"],
+                "created": self._stats["created"],
+                "discarded": self._stats["discarded"],
+            }
+
+    def dispose(self):
+        """Close every idle connection (checked-out ones are closed when returned)."""
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._open -= len(idle)
+        for raw, _ in idle:
+            self._close_quietly(raw)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """
+    Returns the process-wide pool, creating it lazily.
+    A forked gunicorn worker gets its own fresh pool instead of sharing
+    the parent's sockets.
+    """
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is None or _pool_pid != pid:
+        with _pool_lock:
+            if _pool is None or _pool_pid != pid:
+                _pool = ConnectionPool()
+                _pool_pid = pid
+    return _pool
+
+
+def get_connection():
+    return get_pool().get()
+
+
+def pool_stats():
+    return get_pool().stats()
@@ -1,36 +1,122 @@
 # email_util.py
 import os
 import smtplib
+import socket
+import time
 from email.mime.text import MIMEText
 
 
-def send_email(to_email: str, subject: str, body: str):
-    gmail_user = os.getenv("GMAIL_USER")
-    gmail_pass = os.getenv("GMAIL_PASS")
+# Errors that mean the session is gone and a fresh connection may help.
+# Not OSError as a whole: every SMTPException is one, and resending after a
+# permanent rejection (bad recipient, refused data) would only repeat it.
+_CONNECTION_ERRORS = (
+    smtplib.SMTPServerDisconnected,
+    smtplib.SMTPConnectError,
+    ConnectionError,
+    socket.timeout,
+)
 
-    if not gmail_user or not gmail_pass:
-        raise RuntimeError("Missing GMAIL_USER or GMAIL_PASS env vars")
 
-    msg = MIMEText(body)
-    msg["Subject"] = subject
-    msg["From"] = gmail_user
-    msg["To"] = to_email
+class SMTPSender:
+    """
+    Keeps one authenticated SMTP session open and reuses it for many messages.
 
-    host = os.getenv("EMAIL_HOST", "smtp.gmail.com")
-    port = int(os.getenv("EMAIL_PORT", "465"))
+    - reconnects (once per message) when the session drops
+    - starts a new session after `max_per_session` messages, since relays
+      such as Gmail cap messages per connection
+    - EMAIL_SECURITY=none talks plain SMTP without login, for a local sink
+      such as `python -m aiosmtpd -n -l localhost:1025`
 
-    
-    if port == 587:
-        with smtplib.SMTP(host, port) as smtp:
-            smtp.ehlo()
-            smtp.starttls()
+    Not thread-safe: use one sender per thread.
+    """
+
+    def __init__(self, host=None, port=None, user=None, password=None,
+                 security=None, max_per_session=None, timeout=30):
+        self.host = host or os.getenv("EMAIL_HOST", "smtp.gmail.com")
+        self.port = int(port or os.getenv("EMAIL_PORT", "465"))
+        self.user = user if user is not None else os.getenv("GMAIL_USER")
+        self.password = password if password is not None else os.getenv("GMAIL_PASS")
+        self.security = (
+            security or os.getenv("EMAIL_SECURITY") or ("starttls" if self.port == 587 else "ssl")
+        ).lower()
+        self.sender = os.getenv("EMAIL_FROM") or self.user
+        self.max_per_session = int(max_per_session or os.getenv("EMAIL_MAX_PER_SESSION", "100"))
+        self.timeout = timeout
+
+        if self.security != "none" and (not self.user or not self.password):
+            raise RuntimeError("Missing GMAIL_USER or GMAIL_PASS env vars")
+
+        self._smtp = None
+        self._sent_in_session = 0
+        self._last_used = 0.0
+
+    # session handling
+
+    def _connect(self):
+        if self.security == "ssl":
+            smtp = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            smtp = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
             smtp.ehlo()
-            smtp.login(gmail_user, gmail_pass)
-            smtp.send_message(msg)
-    else:
-        
-        with smtplib.SMTP_SSL(host, port) as smtp:
-            smtp.login(gmail_user, gmail_pass)
-            smtp.send_message(msg)
-
-    print(f"✅ Email sent to {to_email} | {subject}")
+            if self.security == "starttls":
+                smtp.starttls()
+                smtp.ehlo()
+        if self.security != "none":
+            smtp.login(self.user, self.password)
+        self._smtp = smtp
+        self._sent_in_session = 0
+        self._last_used = time.monotonic()
+
+    def _ensure_session(self):
+        if self._smtp is not None and self._sent_in_session >= self.max_per_session:
+            self.close()
+        if self._smtp is not None and time.monotonic() - self._last_used > 60:
+            # Servers drop idle sessions; check before reusing
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self.close()
+            except Exception:
+                self.close()
+        if self._smtp is None:
+            self._connect()
+
+    def close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is not None:
+            try:
+                smtp.quit()
+            except Exception:
+                try:
+                    smtp.close()
+                except Exception:
+                    pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # sending
+
+    def _build(self, to_email, subject, body):
+        msg = MIMEText(body)
+        msg["Subject"] = subject
+        msg["From"] = self.sender
+        msg["To"] = to_email
+        return msg
+
+    def send(self, to_email: str, subject: str, body: str):
+        msg = self._build(to_email, subject, body)
+        for attempt in (1, 2):
+            self._ensure_session()
+            try:
+                self._smtp.send_message(msg)
+                break
+            except _CONNECTION_ERRORS:
+                self.close()
+                if attempt == 2:
+                    raise
+        self._sent_in_session += 1
+        self._last_used = time.monotonic()
+        print(f"✅ Email sent to {to_email} | {subject}")
@@ -0,0 +1,290 @@
+# job_runner.py
+"""
+Sharded, resumable execution of the per-user sweeps (reminders, alerts).
+
+A run is identified by (job_name, run_date). The first call of the day
+splits the Users id range into JOB_SHARDS contiguous [user_lo, user_hi)
+shards and records them in JobCheckpoints. Shards are then processed
+concurrently by JOB_WORKERS threads, JOB_CHUNK_USERS user ids at a time.
+
+Each chunk's work and its checkpoint (next_user_id) commit in the same
+transaction, so calling the job again after a crash resumes every shard
+from the first chunk that did not commit, without repeating any work.
+Users created after the day's shards were laid out get an extra shard on
+the next call.
+
+A claimed shard records its owner (this process). A 'running' shard is
+normally left alone until JOB_SHARD_LEASE_SECONDS pass without progress,
+but a newly elected leader resumes with take_over=True and claims any
+shard another process holds. Checkpoints only commit while the owner still
+matches, so a process whose shard was taken over rolls back its chunk and
+stops instead of repeating the new owner's work.
+"""
+import os
+import socket
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+from db import get_connection
+
+JOB_SHARDS = int(os.getenv("JOB_SHARDS", "8"))
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_CHUNK_USERS = int(os.getenv("JOB_CHUNK_USERS", "1000"))
+# A 'running' shard whose checkpoint has not moved for this long is
+# considered abandoned and may be picked up again.
+JOB_SHARD_LEASE_SECONDS = int(os.getenv("JOB_SHARD_LEASE_SECONDS", "600"))
+
+# Identifies this process as a shard owner
+_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def user_filter(column, users):
+    """
+    SQL predicate (and params) restricting `column` to `users`, which is
+    either a range of ids (a shard chunk) or an explicit list of ids.
+    """
+    if isinstance(users, range):
+        return f"{column} >= %s AND {column} < %s", (users.start, users.stop)
+    users = list(users)
+    if not users:
+        return "FALSE", ()
+    return f"{column} IN ({', '.join(['%s'] * len(users))})", tuple(users)
+
+
+def shard_ranges(user_lo, user_hi, shards):
+    """Splits [user_lo, user_hi) into at most `shards` contiguous ranges."""
+    span = user_hi - user_lo
+    if span <= 0:
+        return []
+    shards = max(1, min(shards, span))
+    step, extra = divmod(span, shards)
+    ranges, lo = [], user_lo
+    for i in range(shards):
+        hi = lo + step + (1 if i < extra else 0)
+        ranges.append((lo, hi))
+        lo = hi
+    return ranges
+
+
+def _ensure_shards(conn, job_name, run_date, shards):
+    """
+    Creates the day's checkpoint rows on the first call, and on later calls
+    one more shard for users created since. Returns all of them.
+    """
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT COUNT(*) AS n, MAX(shard_no) AS last_shard, MAX(user_hi) AS covered
+        FROM JobCheckpoints
+        WHERE job_name = %s AND run_date = %s
+        """,
+        (job_name, run_date),
+    )
+    existing = cursor.fetchone()
+    cursor.execute("SELECT MIN(user_id) AS lo, MAX(user_id) AS hi FROM Users")
+    bounds = cursor.fetchone()
+
+    new_shards = []
+    if bounds["lo"] is not None:
+        if existing["n"] == 0:
+            new_shards = list(enumerate(shard_ranges(bounds["lo"], bounds["hi"] + 1, shards)))
+        elif bounds["hi"] >= existing["covered"]:
+            new_shards = [(existing["last_shard"] + 1, (existing["covered"], bounds["hi"] + 1))]
+    if new_shards:
+        # INSERT IGNORE: a concurrent starter may have created them already
+        cursor.executemany(
+            """
+            INSERT IGNORE INTO JobCheckpoints
+                (job_name, run_date, shard_no, user_lo, user_hi, next_user_id)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            [
+                (job_name, run_date, shard_no, lo, hi, lo)
+                for shard_no, (lo, hi) in new_shards
+            ],
+        )
+    conn.commit()
+
+    cursor.execute(
+        """
+        SELECT shard_no, user_lo, user_hi, next_user_id, status
+        FROM JobCheckpoints
+        WHERE job_name = %s AND run_date = %s
+        ORDER BY shard_no
+        """,
+        (job_name, run_date),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def _claim_shard(conn, job_name, run_date, shard_no, take_over=False):
+    """
+    Marks a shard as running under this process unless it is done or another
+    worker holds it (take_over ignores the other worker's lease). Returns
+    the shard's (next_user_id, user_hi) as of the claim, or None.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE JobCheckpoints
+        SET status = 'running', last_error = NULL, owner = %s
+        WHERE job_name = %s AND run_date = %s AND shard_no = %s
+          AND (status IN ('pending', 'failed')
+               OR (status = 'running'
+                   AND (updated_at < NOW() - INTERVAL %s SECOND
+                        OR (%s AND NOT owner <=> %s))))
+        """,
+        (_OWNER, job_name, run_date, shard_no, JOB_SHARD_LEASE_SECONDS, take_over, _OWNER),
+    )
+    claimed = cursor.rowcount == 1
+    conn.commit()
+    position = None
+    if claimed:
+        # The previous owner may have checkpointed after the shard list was read
+        cursor.execute(
+            """
+            SELECT next_user_id, user_hi FROM JobCheckpoints
+            WHERE job_name = %s AND run_date = %s AND shard_no = %s
+            """,
+            (job_name, run_date, shard_no),
+        )
+        position = cursor.fetchone()
+        conn.commit()
+    cursor.close()
+    return position
+
+
+def _run_shard(job_name, run_date, shard, work, take_over=False):
+    conn = get_connection()
+    processed = 0
+    try:
+        position = _claim_shard(conn, job_name, run_date, shard["shard_no"], take_over)
+        if position is None:
+            return 0
+
+        cursor = conn.cursor(dictionary=True)
+        lo, hi = position
+        while lo < hi:
+            chunk_hi = min(lo + JOB_CHUNK_USERS, hi)
+            count = work(cursor, range(lo, chunk_hi), run_date) or 0
+            # Checkpoint commits atomically with the chunk's work
+            cursor.execute(
+                """
+                UPDATE JobCheckpoints
+                SET next_user_id = %s,
+                    processed = processed + %s,
+                    status = IF(%s >= user_hi, 'done', 'running')
+                WHERE job_name = %s AND run_date = %s AND shard_no = %s
+                  AND owner = %s
+                """,
+                (chunk_hi, count, chunk_hi, job_name, run_date, shard["shard_no"], _OWNER),
+            )
+            if cursor.rowcount != 1:
+                # Taken over by a new leader: its owner redoes this chunk
+                conn.rollback()
+                print(f"{job_name} shard {shard['shard_no']} taken over; stopping")
+                break
+            conn.commit()
+            processed += count
+            lo = chunk_hi
+        cursor.close()
+        return processed
+    except Exception as e:
+        conn.rollback()
+        traceback.print_exc()
+        cursor = conn.cursor()
+        cursor.execute(
+            """
+            UPDATE JobCheckpoints
+            SET status = 'failed', last_error = %s
+            WHERE job_name = %s AND run_date = %s AND shard_no = %s
+              AND owner = %s
+            """,
+            (str(e)[:500], job_name, run_date, shard["shard_no"], _OWNER),
+        )
+        conn.commit()
+        cursor.close()
+        return processed
+    finally:
+        conn.close()
+
+
+def run_sharded(job_name, work, run_date=None, shards=None, workers=None, take_over=False):
+    """
+    Runs work(cursor, users, run_date) -> int over every user id, shard by
+    shard; `users` is a range of ids (see user_filter). `work` must not
+    commit; the runner commits each chunk together with its checkpoint.
+    take_over=True also claims shards another process is still marked as
+    running (the new leader resuming a dead one's run).
+    Returns the summed result of this call.
+    """
+    run_date = run_date or date.today()
+    shards = shards or JOB_SHARDS
+    workers = workers or JOB_WORKERS
+
+    conn = get_connection()
+    try:
+        pending = [
+            s for s in _ensure_shards(conn, job_name, run_date, shards)
+            if s["status"] != "done"
+        ]
+    finally:
+        conn.close()
+
+    if not pending:
+        return 0
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix=job_name) as pool:
+        results = pool.map(
+            lambda s: _run_shard(job_name, run_date, s, work, take_over), pending
+        )
+        total = sum(results)
+
+    print(f"✔ {job_name} {run_date}: {len(pending)} shard(s), {total} item(s)")
+    return total
+
+
+def has_unfinished_run(job_name, run_date=None):
+    """True when the day's run was started but some shard is not done."""
+    run_date = run_date or date.today()
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        SELECT COUNT(*)
+        FROM JobCheckpoints
+        WHERE job_name = %s AND run_date = %s AND status <> 'done'
+        """,
+        (job_name, run_date),
+    )
+    unfinished = cursor.fetchone()[0] > 0
+    cursor.close()
+    conn.close()
+    return unfinished
+
+
+def job_progress(job_name, run_date=None):
+    """Per-shard checkpoint rows for a run, for the debug endpoint."""
+    run_date = run_date or date.today()
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT shard_no, user_lo, user_hi, next_user_id, status, processed,
+               last_error, updated_at
+        FROM JobCheckpoints
+        WHERE job_name = %s AND run_date = %s
+        ORDER BY shard_no
+        """,
+        (job_name, run_date),
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    for row in rows:
+        row["updated_at"] = row["updated_at"].isoformat() if row["updated_at"] else None
+    return rows
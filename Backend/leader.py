@@ -0,0 +1,109 @@
+# leader.py
+"""
+Cluster-wide leader election on a MySQL advisory lock.
+
+Every process that wants to run the scheduler starts a LeaderElector. Each
+one keeps its own dedicated (non-pooled) connection and tries GET_LOCK on
+it; the lock is tied to that session, so exactly one process holds it at a
+time. When the leader process dies, or its connection drops, MySQL
+releases the lock and a follower acquires it on its next attempt.
+
+The leader re-checks the lock every LEADER_CHECK_SECONDS, which also keeps
+its session alive; if the check fails it steps down before trying again.
+"""
+import os
+import threading
+
+from db import _connect
+
+LEADER_LOCK_NAME = os.getenv("LEADER_LOCK_NAME", "mymoneypal.scheduler")
+LEADER_CHECK_SECONDS = float(os.getenv("LEADER_CHECK_SECONDS", "15"))
+
+
+class LeaderElector:
+    def __init__(self, on_elected, on_demoted, lock_name=None, interval=None):
+        self.on_elected = on_elected
+        self.on_demoted = on_demoted
+        self.lock_name = lock_name or LEADER_LOCK_NAME
+        self.interval = interval or LEADER_CHECK_SECONDS
+        self.is_leader = False
+        self._conn = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # lock handling
+
+    def _query(self, sql, params=()):
+        if self._conn is None:
+            self._conn = _connect()
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchone()[0]
+        finally:
+            cursor.close()
+
+    def _drop_connection(self):
+        conn, self._conn = self._conn, None
+        if conn is not None:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def _try_acquire(self):
+        return self._query("SELECT GET_LOCK(%s, 0)", (self.lock_name,)) == 1
+
+    def _still_held(self):
+        return self._query("SELECT IS_USED_LOCK(%s) = CONNECTION_ID()", (self.lock_name,)) == 1
+
+    def _step_down(self):
+        if self.is_leader:
+            self.is_leader = False
+            print(f"Scheduler leadership lost ({self.lock_name})")
+            try:
+                self.on_demoted()
+            except Exception as e:
+                print("Error while stopping leader jobs:", repr(e))
+
+    def _tick(self):
+        try:
+            if self.is_leader:
+                if not self._still_held():
+                    self._step_down()
+                return
+            if self._try_acquire():
+                self.is_leader = True
+                print(f"✔ Scheduler leadership acquired ({self.lock_name})")
+                self.on_elected()
+        except Exception as e:
+            # Connection trouble: the server drops our lock with the session
+            print("Leader election check failed:", repr(e))
+            self._step_down()
+            self._drop_connection()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._tick()
+            self._stop.wait(self.interval)
+
+    # lifecycle
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="leader-elector", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.interval + 5)
+        self._step_down()
+        if self._conn is not None:
+            try:
+                self._query("SELECT RELEASE_LOCK(%s)", (self.lock_name,))
+            except Exception:
+                pass
+        self._drop_connection()
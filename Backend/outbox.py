@@ -0,0 +1,299 @@
+# outbox.py
+"""
+Durable email outbox.
+
+Jobs queue emails (directly or through an EmailDigest) on their own cursor,
+so the emails commit (or roll back) together with the Notifications rows
+they describe; no SMTP traffic happens while a job holds its connection.
+drain_outbox() then delivers pending rows with a bounded pool of sender
+threads, retrying failures with exponential backoff and dead-lettering rows
+that keep failing.
+"""
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from db import get_connection
+from email_util import SMTPSender
+
+OUTBOX_WORKERS = int(os.getenv("OUTBOX_WORKERS", "4"))
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "6"))
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "30"))      # seconds
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "3600"))      # seconds
+OUTBOX_LEASE_SECONDS = int(os.getenv("OUTBOX_LEASE_SECONDS", "300"))
+# 1 = one combined email per user per run, 0 = one email per alert/reminder
+EMAIL_DIGEST = os.getenv("EMAIL_DIGEST", "1") == "1"
+
+_executor = None
+_executor_lock = threading.Lock()
+_drain_lock = threading.Lock()
+_local = threading.local()
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "drains": 0,
+    "sent": 0,
+    "failed_attempts": 0,
+    "dead_lettered": 0,
+    "send_seconds": 0.0,
+    "last_drain_at": None,
+    "last_drain_sent": 0,
+    "last_drain_rate": 0.0,   # messages / second during the last drain
+}
+
+
+def enqueue_emails(cursor, emails):
+    """
+    Queues [(user_id, to_email, subject, body), ...] for delivery.
+    Does not commit: the caller's transaction decides.
+    """
+    emails = list(emails)
+    if not emails:
+        return 0
+    cursor.executemany(
+        """
+        INSERT INTO EmailOutbox (user_id, to_email, subject, body)
+        VALUES (%s, %s, %s, %s)
+        """,
+        emails,
+    )
+    return len(emails)
+
+
+class EmailDigest:
+    """
+    Collects the emails a run wants to send and queues them on flush().
+
+    In digest mode every user with more than one item gets a single email
+    listing all of them, grouped by section; a user with one item gets that
+    item's own email. Notifications rows stay per item either way.
+    """
+
+    def __init__(self, digest=None):
+        self.digest = EMAIL_DIGEST if digest is None else digest
+        self._by_user = OrderedDict()
+
+    def add(self, user_id, to_email, username, subject, body, section, summary):
+        """`summary` is the one-line version of the item used in a digest."""
+        entry = self._by_user.setdefault(
+            user_id, {"to_email": to_email, "username": username, "items": []}
+        )
+        entry["items"].append((subject, body, section, summary))
+
+    def _messages(self):
+        for user_id, entry in self._by_user.items():
+            items = entry["items"]
+            if not self.digest or len(items) == 1:
+                for subject, body, _, _ in items:
+                    yield (user_id, entry["to_email"], subject, body)
+                continue
+
+            sections = OrderedDict()
+            for _, _, section, summary in items:
+                sections.setdefault(section, []).append(summary)
+
+            lines = [f"Hi {entry['username']},", ""]
+            for section, summaries in sections.items():
+                lines.append(f"{section} ({len(summaries)})")
+                lines.extend(f"  • {summary}" for summary in summaries)
+                lines.append("")
+            lines.append("— My Money Pal")
+
+            subject = f"📬 My Money Pal: {len(items)} updates for you"
+            yield (user_id, entry["to_email"], subject, "\n".join(lines))
+
+    def flush(self, cursor):
+        """Queues the collected emails; returns how many were queued."""
+        queued = enqueue_emails(cursor, self._messages())
+        self._by_user.clear()
+        return queued
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=OUTBOX_WORKERS, thread_name_prefix="outbox"
+            )
+        return _executor
+
+
+def _thread_sender():
+    """Each worker thread keeps its own persistent SMTP session."""
+    sender = getattr(_local, "sender", None)
+    if sender is None:
+        sender = SMTPSender()
+        _local.sender = sender
+    return sender
+
+
+def _deliver(email):
+    try:
+        _thread_sender().send(email["to_email"], email["subject"], email["body"])
+        return None
+    except Exception as e:
+        sender = getattr(_local, "sender", None)
+        if sender is not None:
+            sender.close()
+            _local.sender = None
+        return str(e)[:500] or repr(e)
+
+
+def _backoff_seconds(attempts):
+    delay = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** (attempts - 1)))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _claim_batch(conn):
+    """Locks up to OUTBOX_BATCH_SIZE due rows and marks them as being sent."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT email_id, to_email, subject, body, attempts
+        FROM EmailOutbox
+        WHERE status = 'pending' AND next_attempt_at <= NOW()
+        ORDER BY next_attempt_at
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """,
+        (OUTBOX_BATCH_SIZE,),
+    )
+    batch = cursor.fetchall()
+    if batch:
+        ids = [row["email_id"] for row in batch]
+        cursor.execute(
+            f"""
+            UPDATE EmailOutbox
+            SET status = 'sending',
+                locked_until = NOW() + INTERVAL %s SECOND
+            WHERE email_id IN ({", ".join(["%s"] * len(ids))})
+            """,
+            (OUTBOX_LEASE_SECONDS, *ids),
+        )
+    conn.commit()
+    cursor.close()
+    return batch
+
+
+def _record_results(conn, batch, errors):
+    cursor = conn.cursor()
+    sent_ids = [email["email_id"] for email, err in zip(batch, errors) if err is None]
+    if sent_ids:
+        cursor.execute(
+            f"""
+            UPDATE EmailOutbox
+            SET status = 'sent', sent_at = NOW(), locked_until = NULL, last_error = NULL
+            WHERE email_id IN ({", ".join(["%s"] * len(sent_ids))})
+            """,
+            tuple(sent_ids),
+        )
+
+    retry_rows, dead_rows = [], []
+    for email, err in zip(batch, errors):
+        if err is None:
+            continue
+        attempts = email["attempts"] + 1
+        if attempts >= OUTBOX_MAX_ATTEMPTS:
+            dead_rows.append((attempts, err, email["email_id"]))
+        else:
+            retry_rows.append((attempts, err, int(_backoff_seconds(attempts)), email["email_id"]))
+
+    if retry_rows:
+        cursor.executemany(
+            """
+            UPDATE EmailOutbox
+            SET status = 'pending', attempts = %s, last_error = %s,
+                next_attempt_at = NOW() + INTERVAL %s SECOND, locked_until = NULL
+            WHERE email_id = %s
+            """,
+            retry_rows,
+        )
+    if dead_rows:
+        cursor.executemany(
+            """
+            UPDATE EmailOutbox
+            SET status = 'dead', attempts = %s, last_error = %s, locked_until = NULL
+            WHERE email_id = %s
+            """,
+            dead_rows,
+        )
+    conn.commit()
+    cursor.close()
+    return len(sent_ids), len(retry_rows) + len(dead_rows), len(dead_rows)
+
+
+def drain_outbox(max_batches=None):
+    """
+    Delivers due outbox rows until none are left (or max_batches is reached).
+    Returns the number of emails sent. Overlapping calls in one process are
+    skipped; other processes are kept apart by FOR UPDATE SKIP LOCKED.
+    """
+    if not _drain_lock.acquire(blocking=False):
+        return 0
+
+    started = time.monotonic()
+    sent_total = failed_total = dead_total = 0
+    try:
+        conn = get_connection()
+        try:
+            # Rows left in 'sending' by a crashed worker become due again
+            cursor = conn.cursor()
+            cursor.execute(
+                """
+                UPDATE EmailOutbox
+                SET status = 'pending', locked_until = NULL
+                WHERE status = 'sending' AND locked_until < NOW()
+                """
+            )
+            conn.commit()
+            cursor.close()
+
+            executor = _get_executor()
+            batches = 0
+            while max_batches is None or batches < max_batches:
+                batch = _claim_batch(conn)
+                if not batch:
+                    break
+                batches += 1
+                errors = list(executor.map(_deliver, batch))
+                sent, failed, dead = _record_results(conn, batch, errors)
+                sent_total += sent
+                failed_total += failed
+                dead_total += dead
+        finally:
+            conn.close()
+    finally:
+        elapsed = time.monotonic() - started
+        with _metrics_lock:
+            _metrics["drains"] += 1
+            _metrics["sent"] += sent_total
+            _metrics["failed_attempts"] += failed_total
+            _metrics["dead_lettered"] += dead_total
+            _metrics["send_seconds"] += elapsed
+            _metrics["last_drain_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            _metrics["last_drain_sent"] = sent_total
+            _metrics["last_drain_rate"] = round(sent_total / elapsed, 2) if elapsed > 0 else 0.0
+        _drain_lock.release()
+
+    return sent_total
+
+
+def outbox_stats():
+    """Process-local throughput counters plus the queue depth per status."""
+    with _metrics_lock:
+        stats = dict(_metrics)
+    stats["workers"] = OUTBOX_WORKERS
+    stats["send_seconds"] = round(stats["send_seconds"], 3)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT status, COUNT(*) FROM EmailOutbox GROUP BY status")
+    stats["queue"] = {status: count for status, count in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+    return stats
@@ -0,0 +1,50 @@
+# pagination.py
+import base64
+import json
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def parse_limit(raw, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parses the ?limit= query param.
+
+    Returns:
+        (limit, error_message)
+    """
+    if raw is None or raw == "":
+        return default, None
+    try:
+        limit = int(raw)
+    except (TypeError, ValueError):
+        return None, "limit must be an integer"
+    if limit < 1:
+        return None, "limit must be >= 1"
+    return min(limit, maximum), None
+
+
+def encode_cursor(values: dict) -> str:
+    """Packs the sort key of the last row into an opaque, URL-safe token."""
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, keys):
+    """
+    Reverses encode_cursor().
+
+    Returns:
+        (values, error_message)
+        - values: dict with exactly `keys`, or None when no cursor was given
+    """
+    if not token:
+        return None, None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception:
+        return None, "Invalid cursor"
+    if not isinstance(values, dict) or set(values) != set(keys):
+        return None, "Invalid cursor"
+    return values, None
@@ -0,0 +1,202 @@
+# passwords.py
+"""
+bcrypt hashing off the request thread.
+
+bcrypt is deliberately slow (~250 ms at cost 12), and running it inline
+let a burst of logins pin every web thread on CPU. Hashing now runs in a
+small process pool, so it neither holds the worker's GIL nor competes
+with cheap read endpoints for threads.
+
+Admission is bounded: at most HASH_WORKERS + HASH_QUEUE_DEPTH hash jobs
+may be in flight per web process. Beyond that the request is refused at
+once with HashingBusy (429), and a job that cannot finish within
+HASH_TIMEOUT_SECONDS raises HashingUnavailable (503), so overload turns
+into fast, retryable errors instead of a growing queue.
+
+Workers are spawned, so under `python app.py` each one imports app.py as
+__mp_main__; app.py must do nothing at import beyond building the app
+(no database access, no threads).
+
+BCRYPT_ROUNDS is the work factor for new hashes. check_password() also
+reports when a stored hash uses a different cost, and returns a fresh hash
+computed in the same worker call so login can upgrade it transparently.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+
+import bcrypt
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_QUEUE_DEPTH = int(os.getenv("HASH_QUEUE_DEPTH", str(HASH_WORKERS * 4)))
+HASH_TIMEOUT_SECONDS = float(os.getenv("HASH_TIMEOUT_SECONDS", "10"))
+HASH_RETRY_AFTER_SECONDS = 1
+
+_executor = None
+_executor_lock = threading.Lock()
+_slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE_DEPTH)
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "hashed": 0,
+    "checked": 0,
+    "rehashed": 0,
+    "in_flight": 0,
+    "rejected_busy": 0,
+    "timed_out": 0,
+    "pool_restarts": 0,
+    "hash_seconds": 0.0,
+}
+
+
+class HashingOverloaded(Exception):
+    status_code = 503
+
+    def __init__(self, message):
+        super().__init__(message)
+        self.message = message
+        self.headers = {"Retry-After": str(HASH_RETRY_AFTER_SECONDS)}
+
+
+class HashingBusy(HashingOverloaded):
+    """Too many hash jobs already queued in this process."""
+    status_code = 429
+
+
+class HashingUnavailable(HashingOverloaded):
+    """The pool is saturated past the timeout, or its workers died."""
+    status_code = 503
+
+
+# Run inside the pool processes; module-level so they can be pickled.
+
+def _hash_in_worker(password, rounds):
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)).decode("utf-8")
+
+
+def _check_in_worker(password, stored_hash, rounds):
+    """Returns (ok, new_hash); new_hash is set only when ok and the cost differs."""
+    try:
+        ok = bcrypt.checkpw(password.encode("utf-8"), stored_hash.encode("utf-8"))
+    except ValueError:
+        return False, None
+    if not ok or hash_rounds(stored_hash) == rounds:
+        return ok, None
+    return True, _hash_in_worker(password, rounds)
+
+
+def hash_rounds(stored_hash):
+    """Cost factor of a "$2b$12$..." hash, or None if it is not bcrypt."""
+    parts = (stored_hash or "").split("$")
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # spawn: forking a threaded web worker is unsafe, and it is the
+            # only start method available on Windows anyway
+            _executor = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _executor
+
+
+def _reset_executor(broken):
+    global _executor
+    with _executor_lock:
+        if _executor is broken:
+            _executor = None
+            with _metrics_lock:
+                _metrics["pool_restarts"] += 1
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
+def _job_done(started):
+    """Frees the admission slot once a job has left the pool (done, failed or cancelled)."""
+    _slots.release()
+    with _metrics_lock:
+        _metrics["in_flight"] -= 1
+        _metrics["hash_seconds"] += time.perf_counter() - started
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        with _metrics_lock:
+            _metrics["rejected_busy"] += 1
+        raise HashingBusy("Too many login attempts in progress, please retry shortly")
+
+    started = time.perf_counter()
+    with _metrics_lock:
+        _metrics["in_flight"] += 1
+    executor = _get_executor()
+    try:
+        future = executor.submit(fn, *args)
+    except BrokenProcessPool:
+        _job_done(started)
+        _reset_executor(executor)
+        raise HashingUnavailable("Authentication is temporarily unavailable, please retry")
+    except BaseException:
+        _job_done(started)
+        raise
+    # The slot is held until the job leaves the pool, not just until this
+    # caller stops waiting, so timed-out jobs still count against admission
+    future.add_done_callback(lambda _: _job_done(started))
+
+    try:
+        return future.result(timeout=HASH_TIMEOUT_SECONDS)
+    except FutureTimeout:
+        # Drops the job if it is still queued; a running bcrypt call finishes
+        future.cancel()
+        with _metrics_lock:
+            _metrics["timed_out"] += 1
+        raise HashingUnavailable("Authentication is temporarily overloaded, please retry")
+    except BrokenProcessPool:
+        _reset_executor(executor)
+        raise HashingUnavailable("Authentication is temporarily unavailable, please retry")
+
+
+def hash_password(password):
+    """bcrypt hash of `password` at BCRYPT_ROUNDS, as a str for the Users table."""
+    hashed = _run(_hash_in_worker, password, BCRYPT_ROUNDS)
+    with _metrics_lock:
+        _metrics["hashed"] += 1
+    return hashed
+
+
+def check_password(password, stored_hash):
+    """
+    Returns (ok, new_hash). new_hash is a replacement hash at BCRYPT_ROUNDS
+    when the password matched a hash of a different cost, otherwise None.
+    Raises HashingOverloaded (HashingBusy / HashingUnavailable) under overload.
+    """
+    if not stored_hash:
+        return False, None
+    ok, new_hash = _run(_check_in_worker, password, stored_hash, BCRYPT_ROUNDS)
+    with _metrics_lock:
+        _metrics["checked"] += 1
+        if new_hash:
+            _metrics["rehashed"] += 1
+    return ok, new_hash
+
+
+def hashing_stats():
+    with _metrics_lock:
+        stats = dict(_metrics)
+    stats.update({
+        "workers": HASH_WORKERS,
+        "queue_depth": HASH_QUEUE_DEPTH,
+        "rounds": BCRYPT_ROUNDS,
+        "pool_started": _executor is not None,
+    })
+    return stats
+
@@ -0,0 +1,202 @@
+# pubsub.py
+"""
+In-process fan-out of new notifications to live SSE connections.
+
+Notifications are written by many processes (web workers, the scheduler
+worker), so one poller thread per process follows the Notifications
+primary key and hands new rows to the subscribers of their user. It only
+runs while this process has subscribers, and it issues one indexed query
+per NOTIFY_POLL_SECONDS however many clients are connected. The clients
+themselves are not free: each open stream holds a web worker thread for as
+long as it stays connected (see the README on serving it).
+
+Ids are allocated at insert but become visible at commit, so a row can
+appear after a higher id has already been seen. Each poll therefore also
+re-reads the subscribed users' rows written in the last
+POLL_OVERLAP_SECONDS and skips ids it has already published.
+
+Each subscriber has a bounded queue. A client too slow to keep up is
+marked overflowed and its stream ends; the browser reconnects with
+Last-Event-ID and catches up from the database, so a slow client never
+holds memory or blocks the poller.
+"""
+import os
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from db import get_connection
+
+NOTIFY_POLL_SECONDS = float(os.getenv("NOTIFY_POLL_SECONDS", "1"))
+SUBSCRIBER_QUEUE_SIZE = int(os.getenv("SSE_QUEUE_SIZE", "100"))
+POLL_BATCH = 500
+# How long after its insert a row's commit may lag and still be delivered
+POLL_OVERLAP_SECONDS = int(os.getenv("NOTIFY_POLL_OVERLAP_SECONDS", "30"))
+
+
+class Subscriber:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, item):
+        try:
+            self.queue.put_nowait(item)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Next item, or None when nothing arrived within `timeout` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class NotificationHub:
+    def __init__(self):
+        self._subscribers = {}   # user_id -> set of Subscriber
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_id = None     # highest id handed out so far
+        self._floor = None       # DB time the hub started; older rows are replayed, not polled
+        self._since = None       # DB time of the last poll
+        self._seen = {}          # recently published id -> created_at
+        self.published = 0
+        self.dropped_subscribers = 0
+
+    # subscriptions
+
+    def _db_position(self):
+        """(database NOW(), current MAX(notification_id))."""
+        conn = get_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(
+                "SELECT NOW(), COALESCE(MAX(notification_id), 0) FROM Notifications"
+            )
+            return cursor.fetchone()
+        finally:
+            cursor.close()
+            conn.close()
+
+    def subscribe(self, user_id):
+        """
+        Registers a subscriber. Rows inserted from now on reach its queue;
+        older ones are the caller's to replay (see Last-Event-ID).
+        """
+        sub = Subscriber(user_id)
+        with self._lock:
+            # Under the lock: a poller that is just stopping resets this state
+            if self._last_id is None:
+                self._floor, self._last_id = self._db_position()
+                self._since = self._floor
+                self._seen = {}
+            self._subscribers.setdefault(user_id, set()).add(sub)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._poll_loop, name="notification-poller", daemon=True
+                )
+                self._thread.start()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+            if sub.overflowed:
+                self.dropped_subscribers += 1
+
+    def publish(self, user_id, item):
+        with self._lock:
+            subs = list(self._subscribers.get(user_id, ()))
+        for sub in subs:
+            sub.offer(item)
+        self.published += 1
+
+    # polling
+
+    def _fetch_new(self, cursor, user_ids, high, recent_from):
+        cursor.execute(
+            f"""
+            SELECT notification_id, user_id, goal_id, message, type, is_read, created_at
+            FROM Notifications
+            WHERE user_id IN ({", ".join(["%s"] * len(user_ids))})
+              AND notification_id <= %s
+              AND (notification_id > %s
+                   OR (created_at >= %s AND created_at > %s))
+            ORDER BY notification_id
+            LIMIT %s
+            """,
+            (*user_ids, high, self._last_id, recent_from, self._floor, POLL_BATCH),
+        )
+        return cursor.fetchall()
+
+    def _poll_once(self):
+        with self._lock:
+            user_ids = list(self._subscribers)
+        if not user_ids:
+            return False
+
+        # Advance the high-water mark over everyone's rows, not just ours
+        db_now, high = self._db_position()
+        recent_from = self._since - timedelta(seconds=POLL_OVERLAP_SECONDS)
+
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            rows = self._fetch_new(cursor, user_ids, high, recent_from)
+        finally:
+            cursor.close()
+            conn.close()
+
+        for row in rows:
+            if row["notification_id"] in self._seen:
+                continue
+            self._seen[row["notification_id"]] = row["created_at"]
+            self.publish(row["user_id"], row)
+
+        if len(rows) == POLL_BATCH:
+            # More to come: keep the overlap window where it is
+            self._last_id = max(self._last_id, rows[-1]["notification_id"])
+        else:
+            self._last_id = high
+            self._since = db_now
+        # Rows older than the window are never returned again
+        self._seen = {i: t for i, t in self._seen.items() if t is not None and t >= recent_from}
+        return True
+
+    def _poll_loop(self):
+        while True:
+            try:
+                if not self._poll_once():
+                    with self._lock:
+                        if not self._subscribers:
+                            # Nobody listening: stop; the next subscribe restarts us
+                            self._thread = None
+                            self._last_id = None
+                            self._seen = {}
+                            return
+            except Exception as e:
+                print("Notification poller error:", repr(e))
+            time.sleep(NOTIFY_POLL_SECONDS)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "users": len(self._subscribers),
+                "subscribers": sum(len(s) for s in self._subscribers.values()),
+                "published": self.published,
+                "dropped_subscribers": self.dropped_subscribers,
+                "last_id": self._last_id,
+                "recent_ids": len(self._seen),
+                "polling": self._thread is not None,
+            }
+
+
+hub = NotificationHub()
@@ -0,0 +1,168 @@
+# revocation.py
+"""
+Revoked access tokens, checked without a database round-trip.
+
+Logout writes the token's jti and exp to RevokedTokens. Each process keeps
+the live (not yet expired) revocations in a dict, jti -> exp, so
+is_revoked() is a dict lookup on every request. Access tokens live only
+ACCESS_TOKEN_MINUTES, so that dict holds at most the logouts of the last
+few minutes and is exact: no Bloom filter false positives to confirm
+against the database.
+
+The dict is loaded by the first token check (requests wait for that
+first load) and refreshed from the table at most every
+REVOCATION_SYNC_SECONDS, by whichever request thread notices first, so a
+logout in one worker reaches the others within that interval. Nothing
+happens at import, so processes that merely import the app (the spawned
+hash workers, the CLI) never touch the database.
+Entries are dropped once their token has expired.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from db import get_connection
+
+REVOCATION_SYNC_SECONDS = float(os.getenv("REVOCATION_SYNC_SECONDS", "5"))
+# Re-read a little history on every sync so rows committed out of order
+# (or stamped by a slightly skewed clock) are not missed
+SYNC_OVERLAP_SECONDS = 30
+REVOCATION_PURGE_CHUNK = 1000
+
+_revoked = {}                 # jti -> exp (epoch seconds)
+_lock = threading.Lock()
+_sync_lock = threading.Lock()
+_synced_through = None        # DB UTC time of the last successful sync
+_last_sync = 0.0              # local monotonic time of the last sync attempt
+_metrics = {"syncs": 0, "sync_errors": 0, "rejected": 0}
+
+
+def _epoch(dt):
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _sync():
+    """Pulls revocations recorded since the last sync (all live ones the first time)."""
+    global _synced_through
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT UTC_TIMESTAMP()")
+        db_now = cursor.fetchone()[0]
+        if _synced_through is None:
+            cursor.execute(
+                "SELECT jti, expires_at FROM RevokedTokens WHERE expires_at > %s",
+                (db_now,),
+            )
+        else:
+            cursor.execute(
+                """
+                SELECT jti, expires_at FROM RevokedTokens
+                WHERE revoked_at >= %s - INTERVAL %s SECOND AND expires_at > %s
+                """,
+                (_synced_through, SYNC_OVERLAP_SECONDS, db_now),
+            )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+        conn.close()
+
+    now = time.time()
+    with _lock:
+        for jti, expires_at in rows:
+            _revoked[jti] = _epoch(expires_at)
+        for jti in [j for j, exp in _revoked.items() if exp <= now]:
+            del _revoked[jti]
+        _metrics["syncs"] += 1
+    _synced_through = db_now
+
+
+def _maybe_sync():
+    global _last_sync
+    if time.monotonic() - _last_sync < REVOCATION_SYNC_SECONDS:
+        return
+    # One thread syncs; the others carry on with the current set, except
+    # before the first load, when there is no set to carry on with
+    if not _sync_lock.acquire(blocking=_synced_through is None):
+        return
+    try:
+        if time.monotonic() - _last_sync < REVOCATION_SYNC_SECONDS:
+            return
+        _last_sync = time.monotonic()
+        try:
+            _sync()
+        except Exception as e:
+            _metrics["sync_errors"] += 1
+            print("Revocation sync error:", repr(e))
+    finally:
+        _sync_lock.release()
+
+
+def is_revoked(jti):
+    if not jti:
+        return False
+    _maybe_sync()
+    exp = _revoked.get(jti)
+    if exp is None:
+        return False
+    if exp <= time.time():
+        with _lock:
+            _revoked.pop(jti, None)
+        return False
+    _metrics["rejected"] += 1
+    return True
+
+
+def revoke(jti, user_id, exp):
+    """Records a token as revoked until `exp` (epoch seconds) and commits."""
+    expires_at = datetime.fromtimestamp(exp, timezone.utc).replace(tzinfo=None)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT IGNORE INTO RevokedTokens (jti, user_id, expires_at, revoked_at)
+            VALUES (%s, %s, %s, UTC_TIMESTAMP())
+            """,
+            (jti, user_id, expires_at),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+    with _lock:
+        _revoked[jti] = float(exp)
+
+
+def purge_expired_revocations():
+    """Deletes revocations whose tokens have expired anyway. Returns the count."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    removed = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM RevokedTokens WHERE expires_at < UTC_TIMESTAMP() LIMIT %s",
+                (REVOCATION_PURGE_CHUNK,),
+            )
+            conn.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < REVOCATION_PURGE_CHUNK:
+                break
+    finally:
+        cursor.close()
+        conn.close()
+
+    if removed:
+        print(f"✔ Revoked tokens: {removed} expired row(s) deleted")
+    return removed
+
+
+def revocation_stats():
+    with _lock:
+        stats = dict(_metrics)
+        stats["live"] = len(_revoked)
+    stats["synced_through"] = _synced_through.isoformat() if _synced_through else None
+    return stats
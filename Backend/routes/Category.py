@@ -1,7 +1,8 @@
 # routes/Category.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from aggregates import reassign_category_rollups, touch_user_data
 
 category_bp = Blueprint("category", __name__)
 
@@ -43,11 +44,8 @@ def ensure_default_categories(conn, user_id: int):
 # GET /categories
 
 @category_bp.route("/categories", methods=["GET"])
-def list_categories():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def list_categories(user_id):
     try:
         conn = get_connection()
         ensure_default_categories(conn, user_id)
@@ -77,11 +75,8 @@ def list_categories():
 
 @category_bp.route("/categories", methods=["POST"])
 @category_bp.route("/category", methods=["POST"])
-def add_category():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def add_category(user_id):
     data = request.get_json() or {}
     name = (data.get("name") or "").strip()
     type_ = (data.get("type") or "expense").strip().lower()
@@ -139,11 +134,8 @@ def add_category():
 # PUT /category/<id>
 
 @category_bp.route("/category/<int:category_id>", methods=["PUT"])
-def update_category(category_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def update_category(category_id, user_id):
     data = request.get_json() or {}
     name = (data.get("name") or "").strip()
     type_ = (data.get("type") or "").strip().lower()
@@ -172,6 +164,7 @@ def update_category(category_id):
             """,
             (name, type_, category_id, user_id),
         )
+        touch_user_data(cursor, user_id)  # cached charts show category names
         conn.commit()
 
         cursor.close()
@@ -185,11 +178,8 @@ def update_category(category_id):
 
 # DELETE /category/<id>
 @category_bp.route("/category/<int:category_id>", methods=["DELETE"])
-def delete_category(category_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def delete_category(category_id, user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -198,8 +188,12 @@ def delete_category(category_id):
             "DELETE FROM Categories WHERE category_id = %s AND user_id = %s",
             (category_id, user_id),
         )
-        conn.commit()
         deleted = cursor.rowcount
+        if deleted:
+            # Transactions fall back to "no category" (ON DELETE SET NULL)
+            reassign_category_rollups(cursor, category_id)
+            touch_user_data(cursor, user_id)
+        conn.commit()
 
         cursor.close()
         conn.close()
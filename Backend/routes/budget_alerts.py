@@ -1,106 +1,171 @@
 # routes/budget_alerts.py
+"""
+Budget alerts are logged on write (budget_engine.evaluate_budget_thresholds);
+their emails go out here, in each user's send window, through the same
+digest as the window's other reminders. Budgets.alert_emailed_level records
+the level already emailed.
+
+queue_budget_alerts() is a safety net that first reconciles
+Budgets.near_limit_sent, e.g. after a bulk data fix. It replaces the plain
+email job only when BUDGET_ALERT_SWEEP=1.
+"""
 from flask import Blueprint, jsonify
-from db import get_connection
-from email_util import send_email
+from budget_engine import (
+    BUDGET_ALERT_THRESHOLDS,
+    alert_content,
+    alert_message,
+    claim_alert_level,
+    threshold_level,
+)
+from job_runner import run_sharded, user_filter
+from outbox import EmailDigest
 
 budget_alerts_bp = Blueprint("budget_alerts_bp", __name__)
 
-NEAR_LIMIT_THRESHOLD = 0.8  # 80%
 
-
-def check_and_send_budget_alerts():
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
-
-    cursor.execute("""
-        SELECT 
+def _find_alerting_budgets(cursor, today, users):
+    """
+    Single grouped query over this month's budgets and MonthlyRollups for
+    `users`. Only budgets at or above the threshold come back.
+    """
+    users_sql, users_params = user_filter("b.user_id", users)
+    cursor.execute(
+        f"""
+        SELECT
             b.budget_id,
             b.user_id,
             b.category_id,
             b.amount_limit,
             b.month,
             b.year,
+            b.near_limit_sent,
             u.email,
             u.username,
-            COALESCE((
-                SELECT SUM(t.amount)
-                FROM Transactions t
-                WHERE t.user_id = b.user_id
-                  AND t.category_id = b.category_id
-                  AND t.type = 'expense'
-                  AND MONTH(t.date) = b.month
-                  AND YEAR(t.date) = b.year
-            ), 0) AS spent_amount
+            SUM(r.total) AS spent_amount
         FROM Budgets b
         JOIN Users u ON u.user_id = b.user_id
-    """)
-
-    budgets = cursor.fetchall()
-    sent = 0
-
-    for row in budgets:
-        limit_amount = float(row["amount_limit"] or 0)
-        spent = float(row["spent_amount"] or 0)
-
-        if limit_amount <= 0 or spent <= 0:
-            continue
-
-        ratio = spent / limit_amount
-        if ratio < NEAR_LIMIT_THRESHOLD:
-            continue
-
-        
-        sig = f"[BUDGET_ALERT][budget_id={row['budget_id']}]"
-        dup_cur = conn.cursor(dictionary=True)
-        dup_cur.execute(
+        JOIN MonthlyRollups r
+          ON r.user_id = b.user_id
+         AND r.year = b.year
+         AND r.month = b.month
+         AND r.type = 'expense'
+         AND (r.category_id = b.category_id OR b.category_id IS NULL)
+        WHERE b.year = %s
+          AND b.month = %s
+          AND {users_sql}
+          AND b.amount_limit > 0
+        GROUP BY
+            b.budget_id, b.user_id, b.category_id, b.amount_limit,
+            b.month, b.year, b.near_limit_sent, u.email, u.username
+        HAVING SUM(r.total) >= b.amount_limit * %s
+        """,
+        (today.year, today.month, *users_params, BUDGET_ALERT_THRESHOLDS[0]),
+    )
+    return cursor.fetchall()
+
+
+def queue_budget_alert_emails(cursor, users, today, emails=None):
+    """
+    Queues the emails for alerts already logged for `users` (a range or list
+    of user ids) but not yet emailed. Emails go to the `emails` digest when
+    one is given (the caller flushes it), otherwise they are queued here.
+    `today` is unused; it keeps the signature of the other window jobs.
+    Does not commit; the runner commits it together with its progress.
+    """
+    users_sql, users_params = user_filter("b.user_id", users)
+    cursor.execute(
+        f"""
+        SELECT
+            b.budget_id,
+            b.user_id,
+            b.amount_limit,
+            b.month,
+            b.year,
+            b.near_limit_sent,
+            u.email,
+            u.username,
+            COALESCE(SUM(r.total), 0) AS spent_amount
+        FROM Budgets b
+        JOIN Users u ON u.user_id = b.user_id
+        LEFT JOIN MonthlyRollups r
+          ON r.user_id = b.user_id
+         AND r.year = b.year
+         AND r.month = b.month
+         AND r.type = 'expense'
+         AND (r.category_id = b.category_id OR b.category_id IS NULL)
+        WHERE {users_sql}
+          AND b.near_limit_sent > b.alert_emailed_level
+          AND b.amount_limit > 0
+        GROUP BY
+            b.budget_id, b.user_id, b.amount_limit, b.month, b.year,
+            b.near_limit_sent, u.email, u.username
+        """,
+        users_params,
+    )
+
+    digest = emails if emails is not None else EmailDigest()
+    queued = 0
+    for row in cursor.fetchall():
+        cursor.execute(
             """
-            SELECT notification_id
-            FROM Notifications
-            WHERE user_id = %s
-              AND type = 'budget_alert'
-              AND message = %s
-              AND DATE(date) = CURDATE()
-            LIMIT 1
+            UPDATE Budgets SET alert_emailed_level = %s
+            WHERE budget_id = %s AND alert_emailed_level < %s
             """,
-            (row["user_id"], sig),
+            (row["near_limit_sent"], row["budget_id"], row["near_limit_sent"]),
         )
-        already = dup_cur.fetchone()
-        dup_cur.close()
-
-        if already:
+        if cursor.rowcount != 1:
             continue
-
-        subject = f"⚠️ Budget Alert ({row['username']}): {ratio*100:.0f}% used"
-        body = (
-            f"Hi {row['username']},\n\n"
-            f"You have spent PKR {spent:.2f} out of PKR {limit_amount:.2f} "
-            f"for this month's budget.\n\n"
-            f"Usage: {ratio*100:.1f}%\n\n"
-            f"Please review your expenses.\n\n"
-            f"— My Money Pal"
+        subject, body, _, summary = alert_content(
+            row["username"], row["spent_amount"], row["amount_limit"], row["month"], row["year"]
         )
+        digest.add(row["user_id"], row["email"], row["username"],
+                   subject, body, "⚠️ Budget alerts", summary)
+        queued += 1
+
+    if emails is None:
+        digest.flush(cursor)
+    return queued
+
+
+def queue_budget_alerts(cursor, users, today, emails=None):
+    """
+    Reconciles this month's alert levels for `users` (a range or list of
+    user ids, `today` being their local date), logs any alert the writes
+    missed, then queues the pending emails like queue_budget_alert_emails().
+    Does not commit; the runner commits it together with its progress.
+    """
+    logged = []
+    for row in _find_alerting_budgets(cursor, today, users):
+        level = threshold_level(row["spent_amount"], row["amount_limit"])
+        # Already alerted at this level (on write or by an earlier sweep)
+        if level <= row["near_limit_sent"] or not claim_alert_level(cursor, row["budget_id"], level):
+            continue
+        logged.append((
+            row["user_id"],
+            alert_message(row["spent_amount"], row["amount_limit"], row["month"], row["year"]),
+        ))
 
-        send_email(row["email"], subject, body)
-        sent += 1
-
-       
-        log_cur = conn.cursor()
-        log_cur.execute(
+    if logged:
+        cursor.executemany(
             """
             INSERT INTO Notifications (user_id, goal_id, message, type)
             VALUES (%s, NULL, %s, 'budget_alert')
             """,
-            (row["user_id"], sig),
+            logged,
         )
-        log_cur.close()
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return sent
+    # The emails and their log rows commit together; the outbox worker
+    # delivers them, so no SMTP call happens while this scan runs.
+    return queue_budget_alert_emails(cursor, users, today, emails)
+
+
+def check_and_send_budget_alerts(take_over=False):
+    """Sharded reconciling sweep over all users; returns the number of emails queued."""
+    return run_sharded("budget_alerts", queue_budget_alerts, take_over=take_over)
+
 
 
 @budget_alerts_bp.route("/debug/send-budget-alerts", methods=["POST"])
 def debug_send_budget_alerts():
-    sent = check_and_send_budget_alerts()
-    return jsonify({"sent": sent}), 200
+    queued = check_and_send_budget_alerts()
+    return jsonify({"queued": queued}), 200
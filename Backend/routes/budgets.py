@@ -1,18 +1,16 @@
 # routes/budgets.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from budget_engine import attach_budget_spend, evaluate_budget_thresholds
 
 budgets_bp = Blueprint("budgets", __name__)
 
 
 # GET /budgets  
 @budgets_bp.route("/budgets", methods=["GET"])
-def list_budgets():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def list_budgets(user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
@@ -25,31 +23,20 @@ def list_budgets():
               b.amount_limit,
               b.month,
               b.year,
-              c.name AS category_name,
-              COALESCE(SUM(t.amount), 0) AS spent_total
+              c.name AS category_name
             FROM Budgets b
             LEFT JOIN Categories c
               ON b.category_id = c.category_id
-            LEFT JOIN Transactions t
-              ON t.user_id = b.user_id
-             AND (t.category_id = b.category_id OR b.category_id IS NULL)
-             AND MONTH(t.date) = b.month
-             AND YEAR(t.date) = b.year
-             AND t.type = 'expense'
             WHERE b.user_id = %s
-            GROUP BY
-              b.budget_id,
-              b.category_id,
-              b.amount_limit,
-              b.month,
-              b.year,
-              c.name
             ORDER BY b.year DESC, b.month DESC, b.budget_id DESC
             """,
             (user_id,),
         )
-
         rows = cursor.fetchall()
+
+        # One grouped pass for every budget's spend (see budget_engine)
+        attach_budget_spend(cursor, user_id, rows)
+
         cursor.close()
         conn.close()
 
@@ -61,11 +48,8 @@ def list_budgets():
 
 # POST /budgets
 @budgets_bp.route("/budgets", methods=["POST"])
-def create_budget():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def create_budget(user_id):
     data = request.get_json() or {}
     category_id = data.get("category_id")
     amount_limit = data.get("amount_limit")
@@ -103,9 +87,12 @@ def create_budget():
             """,
             (user_id, category_id, amount_limit, month, year),
         )
+        new_id = cursor.lastrowid
+
+        # A budget created below what is already spent alerts right away
+        evaluate_budget_thresholds(cursor, user_id, [(year, month)])
 
         conn.commit()
-        new_id = cursor.lastrowid
 
         cursor.close()
         conn.close()
@@ -118,14 +105,12 @@ def create_budget():
 
 # PUT /budgets
 @budgets_bp.route("/budgets/<int:budget_id>", methods=["PUT"])
-def update_budget(budget_id):
+@login_required
+def update_budget(budget_id, user_id):
     """
     Update an existing budget's category and/or limit.
     Month/year stay the same. Only the owner (user_id) can update.
     """
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
 
     data = request.get_json() or {}
     category_id = data.get("category_id")
@@ -161,6 +146,12 @@ def update_budget(budget_id):
             conn.close()
             return jsonify({"error": "Budget not found"}), 404
 
+        # A new limit or category can cross (or re-arm) a threshold
+        cursor.execute("SELECT year, month FROM Budgets WHERE budget_id = %s", (budget_id,))
+        period = cursor.fetchone()
+        if period and period[0] and period[1]:
+            evaluate_budget_thresholds(cursor, user_id, [(period[0], period[1])])
+
         conn.commit()
         cursor.close()
         conn.close()
@@ -173,11 +164,8 @@ def update_budget(budget_id):
 
 # DELETE /budgets
 @budgets_bp.route("/budgets/<int:budget_id>", methods=["DELETE"])
-def delete_budget(budget_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def delete_budget(budget_id, user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor()
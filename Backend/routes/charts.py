@@ -1,61 +1,337 @@
 # routes/charts.py
-from flask import Blueprint, jsonify, request, current_app
+from flask import Blueprint, jsonify, request
 from db import get_connection
-import jwt
+from auth_utils import login_required
+from aggregates import user_data_version
+from cache import LRUCache
+from datetime import date, datetime, timedelta
+import os
 
 charts_bp = Blueprint("charts_bp", __name__)
 
-def get_user_id_from_token():
-    auth_header = request.headers.get("Authorization")
-    if not auth_header:
-        return None, "Missing Authorization header"
+# Per-user chart results, tagged with the user's data_version so they are
+# reused until that user's next transaction write (in any worker).
+chart_cache = LRUCache(maxsize=int(os.getenv("CHART_CACHE_SIZE", "2048")))
 
-    try:
-        token = auth_header.split(" ")[1]  
-        secret = current_app.config["SECRET_KEY"]
-        decoded = jwt.decode(token, secret, algorithms=["HS256"])
-        return decoded["user_id"], None
-    except Exception:
-        return None, "Invalid or expired token"
+GRANULARITIES = ("day", "week", "month")
+DEFAULT_WINDOWS = {"day": 30, "week": 12, "month": 6}  # buckets ending today
+MAX_BUCKETS = 400
+# Leaves headroom for the bucket arithmetic on either side of the window
+CHART_MIN_DATE = date(1900, 1, 1)
+CHART_MAX_DATE = date(9998, 12, 31)
+
+def _month_after(d):
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _month_bounds_clause(lower, upper):
+    """SQL on MonthlyRollups (year, month) for lower <= month start < upper (either may be None)."""
+    clauses, params = [], []
+    if lower is not None:
+        clauses.append("(year > %s OR (year = %s AND month >= %s))")
+        params.extend([lower.year, lower.year, lower.month])
+    if upper is not None:
+        clauses.append("(year < %s OR (year = %s AND month < %s))")
+        params.extend([upper.year, upper.year, upper.month])
+    return clauses, params
+
+
+def _split_window(start, end):
+    """
+    Splits the inclusive window [start, end] (either bound may be None) into
+    whole calendar months, answered from MonthlyRollups, and at most two
+    partial-month edges, answered with a date range on Transactions.
+
+    Returns:
+        (months, edges)
+        - months: (lower, upper) month starts, upper exclusive, or None
+        - edges: [(from_date, to_date_exclusive), ...]
+    """
+    end_excl = end + timedelta(days=1) if end is not None else None
+
+    lower = start if start is None or start.day == 1 else _month_after(start)
+    upper = end_excl.replace(day=1) if end_excl is not None else None
+
+    if lower is not None and upper is not None and lower >= upper:
+        return None, [(start, end_excl)]
+
+    edges = []
+    if start is not None and start < lower:
+        edges.append((start, lower))
+    if end_excl is not None and upper < end_excl:
+        edges.append((upper, end_excl))
+    return (lower, upper), edges
+
+
+def _load_category_totals(cursor, user_id, type_, start, end):
+    """{category_id: total} for the window; category_id 0 = uncategorized."""
+    totals = {}
+    months, edges = _split_window(start, end)
+
+    if months is not None:
+        clauses, params = _month_bounds_clause(*months)
+        cursor.execute(
+            f"""
+            SELECT category_id, SUM(total) AS total
+            FROM MonthlyRollups
+            WHERE user_id = %s AND type = %s
+            {"".join(" AND " + c for c in clauses)}
+            GROUP BY category_id
+            """,
+            (user_id, type_, *params),
+        )
+        for row in cursor.fetchall():
+            totals[row["category_id"]] = totals.get(row["category_id"], 0.0) + float(row["total"])
 
+    for edge_from, edge_to in edges:
+        # Half-open date range on idx_txn_user_type_date
+        cursor.execute(
+            """
+            SELECT COALESCE(category_id, 0) AS category_id, SUM(amount) AS total
+            FROM Transactions
+            WHERE user_id = %s AND type = %s
+              AND date >= %s AND date < %s
+            GROUP BY category_id
+            """,
+            (user_id, type_, edge_from, edge_to),
+        )
+        for row in cursor.fetchall():
+            totals[row["category_id"]] = totals.get(row["category_id"], 0.0) + float(row["total"])
+
+    return totals
 
 
 @charts_bp.route("/charts/category-spending", methods=["GET"])
 @charts_bp.route("/api/category-spending", methods=["GET"])
-def category_spending():
+@login_required
+def category_spending(user_id):
     """
-    Returns: [{ "category": "Education", "total_spent": 18000.00 }, ...]
-    Uses only EXPENSE transactions for the logged-in user.
+    Returns: [{ "category_id": 3, "category": "Education", "total_spent": 18000.00 }, ...]
+    Totals per category for the logged-in user, largest first.
+
+    Query params:
+        type      expense (default) | income
+        from, to  optional inclusive YYYY-MM-DD window (default: all time)
     """
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
+
+    type_ = (request.args.get("type") or "expense").lower()
+    if type_ not in ("income", "expense"):
+        return jsonify({"error": "type must be income or expense"}), 400
+
+    try:
+        start = (
+            datetime.strptime(request.args["from"], "%Y-%m-%d").date()
+            if request.args.get("from") else None
+        )
+        end = (
+            datetime.strptime(request.args["to"], "%Y-%m-%d").date()
+            if request.args.get("to") else None
+        )
+    except ValueError:
+        return jsonify({"error": "from/to must be in YYYY-MM-DD format"}), 400
+
+    if start is not None and end is not None and start > end:
+        return jsonify({"error": "from must be before to"}), 400
 
     conn = get_connection()
     cursor = conn.cursor(dictionary=True)
     try:
-        sql = """
-            SELECT
-                c.name AS category,
-                COALESCE(
-                    SUM(
-                        CASE
-                            WHEN t.type = 'expense' THEN t.amount
-                            ELSE 0
-                        END
-                    ), 0
-                ) AS total_spent
-            FROM Categories c
-            LEFT JOIN Transactions t
-              ON t.category_id = c.category_id
-             AND t.user_id = %s
-            WHERE c.user_id = %s OR c.user_id IS NULL
-            GROUP BY c.name
-            ORDER BY total_spent DESC;
-        """
-        cursor.execute(sql, (user_id, user_id))
-        rows = cursor.fetchall()
+        cache_key = ("category-spending", user_id, type_, start, end)
+        version = user_data_version(cursor, user_id)
+        cached = chart_cache.get(cache_key)
+        if cached is not None and version is not None and cached[0] == version:
+            return jsonify(cached[1]), 200
+
+        totals = _load_category_totals(cursor, user_id, type_, start, end)
+
+        names = {}
+        category_ids = [cid for cid in totals if cid]
+        if category_ids:
+            cursor.execute(
+                f"""
+                SELECT category_id, name
+                FROM Categories
+                WHERE category_id IN ({", ".join(["%s"] * len(category_ids))})
+                """,
+                tuple(category_ids),
+            )
+            names = {row["category_id"]: row["name"] for row in cursor.fetchall()}
+
+        rows = [
+            {
+                "category_id": cid or None,
+                "category": names.get(cid, "Uncategorized"),
+                "total_spent": round(total, 2),
+            }
+            for cid, total in totals.items()
+            if round(total, 2) > 0
+        ]
+        rows.sort(key=lambda r: r["total_spent"], reverse=True)
+
+        if version is not None:
+            chart_cache.set(cache_key, (version, rows))
         return jsonify(rows), 200
     finally:
         cursor.close()
         conn.close()
+
+
+def _bucket_start(d, granularity):
+    if granularity == "day":
+        return d
+    if granularity == "week":
+        return d - timedelta(days=d.weekday())  # ISO weeks start on Monday
+    return d.replace(day=1)
+
+
+def _next_bucket(d, granularity):
+    if granularity == "day":
+        return d + timedelta(days=1)
+    if granularity == "week":
+        return d + timedelta(days=7)
+    return _month_after(d)
+
+
+def _shift_back(d, granularity, buckets):
+    """Start of the bucket `buckets - 1` buckets before the one containing d."""
+    d = _bucket_start(d, granularity)
+    if granularity == "day":
+        return d - timedelta(days=buckets - 1)
+    if granularity == "week":
+        return d - timedelta(days=7 * (buckets - 1))
+    months = d.year * 12 + (d.month - 1) - (buckets - 1)
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _load_income_expense(cursor, user_id, granularity, start, end):
+    """{bucket_start: {"income": x, "expense": y}} from the rollup tables."""
+    totals = {}
+
+    daily_from = start
+    if granularity == "month":
+        # Whole months come from MonthlyRollups; a `to` that falls mid-month
+        # cuts the last month short, so that one is summed from DailyRollups
+        month_upper = (
+            _month_after(end) if (end + timedelta(days=1)).day == 1 else end.replace(day=1)
+        )
+        daily_from = month_upper
+        cursor.execute(
+            """
+            SELECT year, month, type, SUM(total) AS total
+            FROM MonthlyRollups
+            WHERE user_id = %s
+              AND (year > %s OR (year = %s AND month >= %s))
+              AND (year < %s OR (year = %s AND month < %s))
+            GROUP BY year, month, type
+            """,
+            (
+                user_id,
+                start.year, start.year, start.month,
+                month_upper.year, month_upper.year, month_upper.month,
+            ),
+        )
+        for row in cursor.fetchall():
+            bucket = date(row["year"], row["month"], 1)
+            totals.setdefault(bucket, {})[row["type"]] = float(row["total"])
+
+    if daily_from <= end:
+        cursor.execute(
+            """
+            SELECT day, type, total
+            FROM DailyRollups
+            WHERE user_id = %s AND day >= %s AND day <= %s
+            """,
+            (user_id, daily_from, end),
+        )
+        for row in cursor.fetchall():
+            bucket = _bucket_start(row["day"], granularity)
+            entry = totals.setdefault(bucket, {})
+            entry[row["type"]] = entry.get(row["type"], 0.0) + float(row["total"])
+
+    return totals
+
+
+@charts_bp.route("/charts/income-expense", methods=["GET"])
+@login_required
+def income_expense(user_id):
+    """
+    Income vs expense per day / week / month, with empty buckets filled in.
+
+    Query params:
+        granularity  day | week | month (default month)
+        from, to     YYYY-MM-DD (default: the last 30 days / 12 weeks / 6 months);
+                     `from` snaps to the start of its bucket, and the last
+                     bucket only counts days up to `to`
+
+    Returns: { "granularity": "month", "from": "2024-01-01", "to": "2024-06-30",
+               "series": [{ "period": "2024-01-01", "income": 0.0, "expense": 0.0 }, ...] }
+    """
+
+    granularity = (request.args.get("granularity") or "month").lower()
+    if granularity not in GRANULARITIES:
+        return jsonify({"error": "granularity must be day, week or month"}), 400
+
+    try:
+        end = (
+            datetime.strptime(request.args["to"], "%Y-%m-%d").date()
+            if request.args.get("to") else date.today()
+        )
+        start = (
+            datetime.strptime(request.args["from"], "%Y-%m-%d").date()
+            if request.args.get("from") else None
+        )
+    except ValueError:
+        return jsonify({"error": "from/to must be in YYYY-MM-DD format"}), 400
+
+    if not all(CHART_MIN_DATE <= d <= CHART_MAX_DATE for d in (start, end) if d is not None):
+        return jsonify({
+            "error": f"from/to must be between {CHART_MIN_DATE} and {CHART_MAX_DATE}"
+        }), 400
+
+    start = (
+        _bucket_start(start, granularity)
+        if start is not None
+        else _shift_back(end, granularity, DEFAULT_WINDOWS[granularity])
+    )
+
+    if start > end:
+        return jsonify({"error": "from must be before to"}), 400
+
+    buckets = []
+    bucket = start
+    while bucket <= end:
+        buckets.append(bucket)
+        if len(buckets) > MAX_BUCKETS:
+            return jsonify({"error": f"Window too large (max {MAX_BUCKETS} buckets)"}), 400
+        bucket = _next_bucket(bucket, granularity)
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cache_key = ("income-expense", user_id, granularity, start, end)
+        version = user_data_version(cursor, user_id)
+        cached = chart_cache.get(cache_key)
+        if cached is not None and version is not None and cached[0] == version:
+            return jsonify(cached[1]), 200
+
+        totals = _load_income_expense(cursor, user_id, granularity, start, end)
+        result = {
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+            "series": [
+                {
+                    "period": b.isoformat(),
+                    "income": round(totals.get(b, {}).get("income", 0.0), 2),
+                    "expense": round(totals.get(b, {}).get("expense", 0.0), 2),
+                }
+                for b in buckets
+            ],
+        }
+
+        if version is not None:
+            chart_cache.set(cache_key, (version, result))
+        return jsonify(result), 200
+    finally:
+        cursor.close()
+        conn.close()
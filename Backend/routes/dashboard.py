@@ -1,46 +1,22 @@
 # routes/dashboard.py
 from flask import Blueprint, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from aggregates import get_user_summary
 
 dashboard_bp = Blueprint("dashboard", __name__)
 
 
 @dashboard_bp.route("/dashboard", methods=["GET"])
-def dashboard_summary():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def dashboard_summary(user_id):
     try:
         conn = get_connection()
-        cursor = conn.cursor()
-
-        # Total income
-        cursor.execute(
-            """
-            SELECT COALESCE(SUM(amount), 0)
-            FROM Transactions
-            WHERE user_id = %s AND type = 'income'
-            """,
-            (user_id,),
-        )
-        total_income = cursor.fetchone()[0]
-
-        # Total expenses
-        cursor.execute(
-            """
-            SELECT COALESCE(SUM(amount), 0)
-            FROM Transactions
-            WHERE user_id = %s AND type = 'expense'
-            """,
-            (user_id,),
-        )
-        total_expenses = cursor.fetchone()[0]
 
+        # Single primary-key read of the incrementally maintained summary
+        total_income, total_expenses, _ = get_user_summary(conn, user_id)
         balance = total_income - total_expenses
 
-        cursor.close()
         conn.close()
 
         return jsonify(
@@ -1,17 +1,15 @@
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
-from datetime import datetime
+from auth_utils import login_required
+from validation import validate_amount_and_date
+from aggregates import apply_transaction_deltas, ensure_user_aggregates
 
 expense_bp = Blueprint("expense", __name__)
 
 
 @expense_bp.route("/expense", methods=["POST"])
-def add_expense():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def add_expense(user_id):
     data = request.get_json()
 
     amount = data.get("amount")
@@ -19,26 +17,13 @@ def add_expense():
     category_id = data.get("category_id")
     note = data.get("note", None)
 
-    # 1. Validate mandatory fields
-    if not amount or not date:
-        return jsonify({"error": "Amount and date are required"}), 400
-
-    # Validate amount
-    try:
-        amount = float(amount)
-        if amount <= 0:
-            return jsonify({"error": "Amount must be greater than 0"}), 400
-    except:
-        return jsonify({"error": "Amount must be a valid number"}), 400
-
-    # Validate date format
-    try:
-        datetime.strptime(date, "%Y-%m-%d")
-    except:
-        return jsonify({"error": "Date must be in YYYY-MM-DD format"}), 400
+    amount, error = validate_amount_and_date(amount, date)
+    if error:
+        return jsonify({"error": error}), 400
 
     # Insert expense
     try:
+        ensure_user_aggregates(user_id)
         conn = get_connection()
         cursor = conn.cursor()
 
@@ -47,6 +32,11 @@ def add_expense():
             VALUES (%s, %s, %s, %s, %s, %s)
         """
         cursor.execute(query, (user_id, category_id, amount, date, "expense", note))
+        apply_transaction_deltas(
+            cursor,
+            user_id,
+            added=[{"amount": amount, "type": "expense", "date": date, "category_id": category_id}],
+        )
         conn.commit()
 
         cursor.close()
@@ -1,16 +1,23 @@
 # routes/goal_reminders.py
-from datetime import date
-from db import get_connection
-from email_util import send_email
+from datetime import timedelta
+from job_runner import run_sharded, user_filter
+from outbox import EmailDigest
 
+REMINDER_DAYS_AHEAD = 3
+GOAL_REMINDER_BATCH = 500
 
-def check_and_send_goal_reminders() -> int:
-    conn = get_connection()
-    cursor = conn.cursor(dictionary=True)
 
+def _due_goals_batch(cursor, users, today, after):
+    """
+    Next batch of goals that still need today's reminder, in
+    (deadline, goal_id) order so it walks idx_goal_notify_deadline.
+    All filtering, including "already reminded today", happens in SQL.
+    """
+    users_sql, users_params = user_filter("g.user_id", users)
+    last_deadline, last_goal_id = after
     cursor.execute(
-        """
-        SELECT 
+        f"""
+        SELECT
             g.goal_id,
             g.user_id,
             g.goal_name,
@@ -21,76 +28,108 @@ def check_and_send_goal_reminders() -> int:
             u.username
         FROM SavingsGoals g
         JOIN Users u ON u.user_id = g.user_id
-        WHERE g.deadline IS NOT NULL
-          AND g.deadline >= CURDATE()
-          AND g.deadline <= DATE_ADD(CURDATE(), INTERVAL 3 DAY)
-        """
+        WHERE g.notify_enabled = 1
+          AND g.deadline >= %s
+          AND g.deadline <= %s
+          AND (g.deadline > %s OR (g.deadline = %s AND g.goal_id > %s))
+          AND COALESCE(g.current_saved, 0) < g.target_amount
+          AND (g.last_reminder_sent IS NULL OR g.last_reminder_sent < %s)
+          AND {users_sql}
+        ORDER BY g.deadline, g.goal_id
+        LIMIT %s
+        """,
+        (
+            today,
+            today + timedelta(days=REMINDER_DAYS_AHEAD),
+            last_deadline, last_deadline, last_goal_id,
+            today,
+            *users_params,
+            GOAL_REMINDER_BATCH,
+        ),
     )
+    return cursor.fetchall()
 
-    rows = cursor.fetchall()
-    sent_count = 0
-    today = date.today()
 
-    for row in rows:
-        target = float(row["target_amount"] or 0)
-        saved = float(row["current_saved"] or 0)
-        remaining = target - saved
+def queue_goal_reminders(cursor, users, today, emails=None) -> int:
+    """
+    Logs and queues reminders for `users` (a range or list of user ids),
+    using `today` as the users' local date. Emails go to the `emails` digest
+    when one is given (the caller flushes it), otherwise they are queued here.
+    Does not commit; the runner commits it together with its progress.
 
-        if remaining <= 0:
-            continue
+    Goals are read in bounded keyset batches, so memory stays flat however
+    many are due, and each batch's writes go out before the next read.
+    """
+    digest = emails if emails is not None else EmailDigest()
+    queued = 0
+    after = (today - timedelta(days=1), 0)
 
-        days_left = (row["deadline"] - today).days
-        if days_left < 0:
-            continue
+    while True:
+        rows = _due_goals_batch(cursor, users, today, after)
+        if not rows:
+            break
+        after = (rows[-1]["deadline"], rows[-1]["goal_id"])
 
-        
-        sig = f"[GOAL_REMINDER][goal_id={row['goal_id']}]"
-        dup_cur = conn.cursor(dictionary=True)
-        dup_cur.execute(
-            """
-            SELECT notification_id
-            FROM Notifications
-            WHERE user_id = %s
-              AND goal_id = %s
-              AND type = 'savings_milestone'
-              AND message = %s
-              AND DATE(date) = CURDATE()
-            LIMIT 1
-            """,
-            (row["user_id"], row["goal_id"], sig),
-        )
-        already = dup_cur.fetchone()
-        dup_cur.close()
-
-        if already:
-            continue
-
-        subject = f"⏰ Savings Goal Reminder: {row['goal_name']} (due soon)"
-        body = (
-            f"Hi {row['username']},\n\n"
-            f"Your savings goal '{row['goal_name']}' is due on {row['deadline']}.\n"
-            f"Target: PKR {target:.2f}\n"
-            f"Saved: PKR {saved:.2f}\n"
-            f"Remaining: PKR {remaining:.2f}\n"
-            f"Days left: {days_left}\n\n"
-            f"Keep going! 💪\n"
-            f"— My Money Pal"
-        )
+        notifications = []
+        for row in rows:
+            target = float(row["target_amount"] or 0)
+            saved = float(row["current_saved"] or 0)
+            remaining = target - saved
+            days_left = (row["deadline"] - today).days
 
-        send_email(row["email"], subject, body)
-        sent_count += 1
+            subject = f"⏰ Savings Goal Reminder: {row['goal_name']} (due soon)"
+            body = (
+                f"Hi {row['username']},\n\n"
+                f"Your savings goal '{row['goal_name']}' is due on {row['deadline']}.\n"
+                f"Target: PKR {target:.2f}\n"
+                f"Saved: PKR {saved:.2f}\n"
+                f"Remaining: PKR {remaining:.2f}\n"
+                f"Days left: {days_left}\n\n"
+                f"Keep going! 💪\n"
+                f"— My Money Pal"
+            )
+            summary = (
+                f"{row['goal_name']}: PKR {remaining:.2f} to go, "
+                f"due {row['deadline']} ({days_left} day(s) left)"
+            )
+            notifications.append((
+                row["user_id"],
+                row["goal_id"],
+                f"Reminder: '{row['goal_name']}' is due on {row['deadline']}, "
+                f"PKR {remaining:.2f} to go",
+            ))
+            digest.add(
+                row["user_id"], row["email"], row["username"],
+                subject, body, "⏰ Savings goals due soon", summary,
+            )
 
-        log_cur = conn.cursor()
-        log_cur.execute(
+        # Logged, marked and queued in one transaction
+        cursor.executemany(
             """
             INSERT INTO Notifications (user_id, goal_id, message, type)
             VALUES (%s, %s, %s, 'savings_milestone')
             """,
-            (row["user_id"], row["goal_id"], sig),
+            notifications,
         )
-        log_cur.close()
+        goal_ids = [row["goal_id"] for row in rows]
+        cursor.execute(
+            f"""
+            UPDATE SavingsGoals
+            SET last_reminder_sent = %s
+            WHERE goal_id IN ({", ".join(["%s"] * len(goal_ids))})
+            """,
+            (today, *goal_ids),
+        )
+        queued += len(rows)
+
+        if len(rows) < GOAL_REMINDER_BATCH:
+            break
+
+    if emails is None:
+        digest.flush(cursor)
+    return queued
+
 
-    conn.commit()
-    cursor.close()
-    conn.close()
-    return sent_count
+def check_and_send_goal_reminders(take_over=False) -> int:
+    """Sharded sweep over all users; returns the number of reminders queued."""
+    return run_sharded("goal_reminders", queue_goal_reminders, take_over=take_over)
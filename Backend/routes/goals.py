@@ -1,18 +1,15 @@
 # routes/goals.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
 
 goals_bp = Blueprint("goals", __name__)
 
 
 # LIST GOALS
 @goals_bp.route("/goals", methods=["GET"])
-def list_goals():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def list_goals(user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
@@ -52,11 +49,8 @@ def list_goals():
 
 # CREATE GOAL
 @goals_bp.route("/goals", methods=["POST"])
-def create_goal():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def create_goal(user_id):
     data = request.get_json() or {}
     goal_name = data.get("goal_name")
     target_amount = data.get("target_amount")
@@ -111,11 +105,8 @@ def create_goal():
 
 # CONTRIBUTE TO GOAL
 @goals_bp.route("/goals/<int:goal_id>/contribute", methods=["POST"])
-def contribute_to_goal(goal_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def contribute_to_goal(goal_id, user_id):
     data = request.get_json() or {}
     amount = data.get("amount")
 
@@ -197,11 +188,8 @@ def contribute_to_goal(goal_id):
 
 # UPDATE GOAL
 @goals_bp.route("/goals/<int:goal_id>", methods=["PUT"])
-def update_goal(goal_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def update_goal(goal_id, user_id):
     data = request.get_json() or {}
 
     try:
@@ -246,11 +234,8 @@ def update_goal(goal_id):
 
 # DELETE GOAL
 @goals_bp.route("/goals/<int:goal_id>", methods=["DELETE"])
-def delete_goal(goal_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def delete_goal(goal_id, user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -1,9 +1,8 @@
 # routes/login.py
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, request, jsonify
 from db import get_connection
-import bcrypt
-import jwt
-from datetime import datetime, timedelta
+from passwords import check_password, HashingOverloaded
+from tokens import issue_access_token, issue_refresh_token
 
 login_bp = Blueprint("login", __name__)
 
@@ -16,6 +15,8 @@ def login():
     if not email or not password:
         return jsonify({"error": "Email and password are required"}), 400
 
+    conn = None
+    cursor = None
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
@@ -30,8 +31,11 @@ def login():
             (email,),
         )
         user = cursor.fetchone()
+        # Give the connection back before the slow hash check: the hash pool
+        # admits more jobs than the DB pool has connections
         cursor.close()
         conn.close()
+        conn = cursor = None
 
         # 2) If user not found -> invalid credentials
         if not user:
@@ -39,38 +43,54 @@ def login():
 
         stored_hash = user["password"] or ""
 
-        # 3) Check  hash
+        # 3) Check hash (in the hashing pool, not on this thread)
         try:
-            ok = bcrypt.checkpw(
-                password.encode("utf-8"),
-                stored_hash.encode("utf-8"),
-            )
-        except Exception:
-            return jsonify({"error": "Invalid credentials"}), 401
+            ok, new_hash = check_password(password, stored_hash)
+        except HashingOverloaded as e:
+            return jsonify({"error": e.message}), e.status_code, e.headers
 
         if not ok:
             return jsonify({"error": "Invalid credentials"}), 401
 
-        # 4) Generate JWT token
-        secret = current_app.config["SECRET_KEY"]
-        exp = datetime.utcnow() + timedelta(hours=3)
+        # One connection for the rehash and the refresh token
+        conn = get_connection()
+        cursor = conn.cursor()
+
+        # Stored under an older work factor: upgrade it now that we know the
+        # password. Conditional, so a concurrent reset is never overwritten.
+        if new_hash:
+            try:
+                cursor.execute(
+                    "UPDATE Users SET password = %s WHERE user_id = %s AND password = %s",
+                    (new_hash, user["user_id"], stored_hash),
+                )
+            except Exception as e:
+                print("PASSWORD REHASH ERROR:", repr(e))
 
-        token = jwt.encode(
-            {"user_id": user["user_id"], "exp": exp},
-            secret,
-            algorithm="HS256",
-        )
+        # 4) Short-lived access token + rotating refresh token, committed
+        # together with the rehash
+        token, expires_in = issue_access_token(user["user_id"])
+        refresh_token, _ = issue_refresh_token(cursor, user["user_id"])
+        conn.commit()
 
-        
         return jsonify(
             {
                 "message": "Login successful",
                 "token": token,
+                "expires_in": expires_in,
+                "refresh_token": refresh_token,
                 "user_id": user["user_id"],
                 "username": user["username"],
             }
         ), 200
 
     except Exception as e:
+        if conn:
+            conn.rollback()
         print("LOGIN ERROR:", repr(e))
         return jsonify({"error": "Server error during login"}), 500
+    finally:
+        if cursor:
+            cursor.close()
+        if conn:
+            conn.close()
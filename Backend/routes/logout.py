@@ -1,24 +1,51 @@
+import time
+
 from flask import Blueprint, request, jsonify, current_app
 import jwt
+from revocation import revoke
+from tokens import revoke_refresh_token
 
 logout_bp = Blueprint("logout", __name__)
 
+# POST /logout  (optional body: { "refresh_token": "..." })
+# Revokes the access token until it expires, and the refresh token's whole
+# family when one is sent, so neither can be used again. The refresh token
+# is revoked even when the access token is missing, invalid or expired.
 @logout_bp.route("/logout", methods=["POST"])
 def logout():
+    data = request.get_json(silent=True) or {}
     auth_header = request.headers.get("Authorization")
 
+    decoded = None
+    error = None
     if not auth_header:
-        return jsonify({"error": "Authorization token missing"}), 401
-
-    parts = auth_header.split()
-    if len(parts) != 2 or parts[0] != "Bearer":
-        return jsonify({"error": "Invalid Authorization header format"}), 401
-
-    token = parts[1]
+        error = "Authorization token missing"
+    else:
+        parts = auth_header.split()
+        if len(parts) != 2 or parts[0] != "Bearer":
+            error = "Invalid Authorization header format"
+        else:
+            try:
+                # Signature only: exp bounds the revocation below and
+                # is not enforced, so an expired token still logs out
+                decoded = jwt.decode(
+                    parts[1],
+                    current_app.config["SECRET_KEY"],
+                    algorithms=["HS256"],
+                    options={"verify_exp": False},
+                )
+            except Exception:
+                error = "Invalid token"
 
     try:
-        secret = current_app.config["SECRET_KEY"]
-        jwt.decode(token, secret, algorithms=["HS256"])
-        return jsonify({"message": "Logged out successfully"}), 200
-    except Exception:
-        return jsonify({"error": "Invalid or expired token"}), 401
+        if data.get("refresh_token"):
+            revoke_refresh_token(data["refresh_token"])
+        if decoded and decoded.get("jti") and decoded.get("exp", 0) > time.time():
+            revoke(decoded["jti"], decoded.get("user_id"), decoded["exp"])
+    except Exception as e:
+        print("LOGOUT ERROR:", repr(e))
+        return jsonify({"error": "Server error during logout"}), 500
+
+    if error and not data.get("refresh_token"):
+        return jsonify({"error": error}), 401
+    return jsonify({"message": "Logged out successfully"}), 200
@@ -1,41 +1,311 @@
 # routes/notifications.py
-from flask import Blueprint, jsonify
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from flask import Blueprint, Response, jsonify, request
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from pagination import parse_limit, encode_cursor, decode_cursor
+from pubsub import hub
+from tokens import consume_stream_token, issue_stream_token
 
 notifications_bp = Blueprint("notifications", __name__)
 
+NOTIFICATION_RETENTION_DAYS = int(os.getenv("NOTIFICATION_RETENTION_DAYS", "90"))
+# 1 = move old rows to NotificationsArchive, 0 = delete them
+NOTIFICATION_ARCHIVE = os.getenv("NOTIFICATION_ARCHIVE", "1") == "1"
+RETENTION_CHUNK = 1000
+RETENTION_PAUSE_SECONDS = 0.05
+SSE_HEARTBEAT_SECONDS = 15
+SSE_REPLAY_LIMIT = 500
 
+NOTIFICATION_COLUMNS = "notification_id, user_id, goal_id, message, type, is_read, created_at"
+
+
+# GET /notifications
+# Keyset-paginated, newest first. Pass ?limit=N (max 500) and the value of the
+# X-Next-Cursor response header as ?cursor= to fetch the next page.
+# ?unread=1 returns unread notifications only.
 @notifications_bp.route("/notifications", methods=["GET"])
-def list_notifications():
-    """
-    Returns all notifications for the current user, newest first.
-    """
-    user_id, error = get_user_id_from_token()
+@login_required
+def list_notifications(user_id):
+    limit, error = parse_limit(request.args.get("limit"))
+    if error:
+        return jsonify({"error": error}), 400
+
+    cursor_values, error = decode_cursor(request.args.get("cursor"), ("created_at", "id"))
     if error:
-        return jsonify({"error": error}), 401
+        return jsonify({"error": error}), 400
+
+    where = ["user_id = %s"]
+    params = [user_id]
+
+    if request.args.get("unread") in ("1", "true"):
+        where.append("is_read = 0")
+
+    if cursor_values:
+        try:
+            created_at = datetime.fromisoformat(cursor_values["created_at"])
+            last_id = int(cursor_values["id"])
+        except (TypeError, ValueError):
+            return jsonify({"error": "Invalid cursor"}), 400
+        where.append("(created_at < %s OR (created_at = %s AND notification_id < %s))")
+        params += [created_at, created_at, last_id]
 
     conn = get_connection()
     cur = conn.cursor(dictionary=True)
 
     cur.execute(
-        """
-        SELECT 
-            notification_id,
-            user_id,
-            goal_id,
-            message,
-            type,
-            created_at
+        f"""
+        SELECT {NOTIFICATION_COLUMNS}
         FROM Notifications
-        WHERE user_id = %s
-        ORDER BY created_at DESC
+        WHERE {" AND ".join(where)}
+        ORDER BY created_at DESC, notification_id DESC
+        LIMIT %s
         """,
-        (user_id,),
+        (*params, limit + 1),
     )
     rows = cur.fetchall()
 
     cur.close()
     conn.close()
 
-    return jsonify(rows), 200
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(
+            {"created_at": last["created_at"].isoformat(), "id": last["notification_id"]}
+        )
+
+    for row in rows:
+        row["is_read"] = bool(row["is_read"])
+
+    response = jsonify(rows)
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return response
+
+
+# GET /notifications/unread-count
+@notifications_bp.route("/notifications/unread-count", methods=["GET"])
+@login_required
+def unread_count(user_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT COUNT(*) FROM Notifications WHERE user_id = %s AND is_read = 0",
+        (user_id,),
+    )
+    count = cur.fetchone()[0]
+    cur.close()
+    conn.close()
+
+    return jsonify({"unread": count}), 200
+
+
+# POST /notifications/<id>/read
+@notifications_bp.route("/notifications/<int:notification_id>/read", methods=["POST"])
+@login_required
+def mark_read(notification_id, user_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE Notifications
+        SET is_read = 1
+        WHERE notification_id = %s AND user_id = %s
+        """,
+        (notification_id, user_id),
+    )
+    conn.commit()
+    cur.execute(
+        "SELECT 1 FROM Notifications WHERE notification_id = %s AND user_id = %s",
+        (notification_id, user_id),
+    )
+    found = cur.fetchone() is not None
+    cur.close()
+    conn.close()
+
+    if not found:
+        return jsonify({"error": "Notification not found"}), 404
+    return jsonify({"message": "Notification marked as read"}), 200
+
+
+# POST /notifications/read-all
+@notifications_bp.route("/notifications/read-all", methods=["POST"])
+@login_required
+def mark_all_read(user_id):
+    conn = get_connection()
+    cur = conn.cursor()
+    cur.execute(
+        "UPDATE Notifications SET is_read = 1 WHERE user_id = %s AND is_read = 0",
+        (user_id,),
+    )
+    updated = cur.rowcount
+    conn.commit()
+    cur.close()
+    conn.close()
+
+    return jsonify({"message": "Notifications marked as read", "updated": updated}), 200
+
+
+def _sse_event(row):
+    data = dict(row)
+    data["is_read"] = bool(data["is_read"])
+    data["created_at"] = data["created_at"].isoformat() if data["created_at"] else None
+    return f"id: {row['notification_id']}\nevent: notification\ndata: {json.dumps(data)}\n\n"
+
+
+def _replay_since(user_id, last_id):
+    """Notifications the client missed while disconnected, oldest first."""
+    conn = get_connection()
+    cur = conn.cursor(dictionary=True)
+    cur.execute(
+        f"""
+        SELECT {NOTIFICATION_COLUMNS}
+        FROM Notifications
+        WHERE user_id = %s AND notification_id > %s
+        ORDER BY notification_id
+        LIMIT %s
+        """,
+        (user_id, last_id, SSE_REPLAY_LIMIT),
+    )
+    rows = cur.fetchall()
+    cur.close()
+    conn.close()
+    return rows
+
+
+# POST /notifications/stream-token
+# EventSource cannot send headers, so a stream is opened with a short-lived,
+# single-use token from here instead of the access token in the URL.
+@notifications_bp.route("/notifications/stream-token", methods=["POST"])
+@login_required
+def create_stream_token(user_id):
+    token, expires_in = issue_stream_token(user_id)
+    return jsonify({"stream_token": token, "expires_in": expires_in}), 200
+
+
+# GET /notifications/stream?stream_token=...
+# Server-Sent Events: each new notification is pushed as an event whose id is
+# its notification_id. The stream token is used up on connect, so to
+# reconnect, fetch a new one and pass the last event id as ?last_event_id=;
+# missed notifications are replayed first. Each open stream holds a web
+# worker thread until the client disconnects.
+@notifications_bp.route("/notifications/stream", methods=["GET"])
+def stream_notifications():
+    try:
+        user_id = consume_stream_token(request.args.get("stream_token"))
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    if user_id is None:
+        return jsonify({"error": "Invalid or expired stream token"}), 401
+
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    def events():
+        # Subscribe before replaying so nothing falls between the two
+        sub = hub.subscribe(user_id)
+        sent = last_event_id or 0
+        replayed = set()
+        try:
+            yield "retry: 3000\n\n"
+            while last_event_id is not None:
+                rows = _replay_since(user_id, sent)
+                for row in rows:
+                    sent = row["notification_id"]
+                    replayed.add(sent)
+                    yield _sse_event(row)
+                if len(rows) < SSE_REPLAY_LIMIT:
+                    break
+
+            while True:
+                if sub.overflowed:
+                    # Too slow to keep up: end the stream; the browser
+                    # reconnects with Last-Event-ID and catches up from the DB
+                    return
+                row = sub.get(timeout=SSE_HEARTBEAT_SECONDS)
+                if row is None:
+                    yield ": keepalive\n\n"
+                    continue
+                # Ids can arrive out of order (see pubsub), so skip only
+                # what the replay already sent
+                if row["notification_id"] in replayed:
+                    continue
+                yield _sse_event(row)
+        finally:
+            hub.unsubscribe(sub)
+
+    return Response(
+        events(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def purge_old_notifications(days=None, archive=None):
+    """
+    Archives (or deletes) notifications older than `days`, RETENTION_CHUNK
+    rows per transaction with a short pause in between, so the job never
+    holds long locks. Each chunk is a short range scan of the
+    idx_notif_created index, which also covers the selected ids, so no
+    chunk reads newer rows. Returns the number of rows removed.
+    """
+    days = NOTIFICATION_RETENTION_DAYS if days is None else days
+    archive = NOTIFICATION_ARCHIVE if archive is None else archive
+    cutoff = datetime.now() - timedelta(days=days)
+
+    conn = get_connection()
+    cur = conn.cursor()
+    removed = 0
+    try:
+        while True:
+            cur.execute(
+                """
+                SELECT notification_id
+                FROM Notifications
+                WHERE created_at < %s
+                ORDER BY created_at, notification_id
+                LIMIT %s
+                """,
+                (cutoff, RETENTION_CHUNK),
+            )
+            ids = [row[0] for row in cur.fetchall()]
+            if not ids:
+                break
+
+            placeholders = ", ".join(["%s"] * len(ids))
+            if archive:
+                cur.execute(
+                    f"""
+                    INSERT INTO NotificationsArchive
+                        (notification_id, user_id, goal_id, message, type, is_read, created_at)
+                    SELECT {NOTIFICATION_COLUMNS}
+                    FROM Notifications
+                    WHERE notification_id IN ({placeholders})
+                    """,
+                    tuple(ids),
+                )
+            cur.execute(
+                f"DELETE FROM Notifications WHERE notification_id IN ({placeholders})",
+                tuple(ids),
+            )
+            conn.commit()
+            removed += len(ids)
+
+            if len(ids) < RETENTION_CHUNK:
+                break
+            time.sleep(RETENTION_PAUSE_SECONDS)
+    finally:
+        cur.close()
+        conn.close()
+
+    if removed:
+        print(f"✔ Notification retention: {removed} row(s) {'archived' if archive else 'deleted'}")
+    return removed
@@ -1,25 +1,23 @@
 # routes/profile.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from send_windows import get_zone, next_window
 
 profile_bp = Blueprint("profile", __name__)
 
 
 # GET /profile
 @profile_bp.route("/profile", methods=["GET"])
-def get_profile():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def get_profile(user_id):
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
         cursor.execute(
             """
-            SELECT username, email
+            SELECT username, email, timezone, notify_hour
             FROM Users
             WHERE user_id = %s
             """,
@@ -33,7 +31,12 @@ def get_profile():
         if not user:
             return jsonify({"error": "User not found"}), 404
 
-        return jsonify({"username": user["username"], "email": user["email"]}), 200
+        return jsonify({
+            "username": user["username"],
+            "email": user["email"],
+            "timezone": user["timezone"],
+            "notify_hour": user["notify_hour"],
+        }), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -41,11 +44,8 @@ def get_profile():
 
 # PUT /profile
 @profile_bp.route("/profile", methods=["PUT"])
-def update_profile():
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def update_profile(user_id):
     data = request.get_json() or {}
     username = data.get("username")
     email = data.get("email")
@@ -53,6 +53,19 @@ def update_profile():
     if not username or not email:
         return jsonify({"error": "username and email are required"}), 400
 
+    # Optional delivery window for reminders and alerts
+    tz_name = data.get("timezone")
+    notify_hour = data.get("notify_hour")
+    if tz_name is not None and get_zone(tz_name) is None:
+        return jsonify({"error": "timezone must be an IANA name such as Asia/Karachi"}), 400
+    if notify_hour is not None:
+        try:
+            notify_hour = int(notify_hour)
+        except (TypeError, ValueError):
+            notify_hour = -1
+        if not 0 <= notify_hour <= 23:
+            return jsonify({"error": "notify_hour must be between 0 and 23"}), 400
+
     try:
         conn = get_connection()
         cursor = conn.cursor()
@@ -65,6 +78,24 @@ def update_profile():
             """,
             (username, email, user_id),
         )
+
+        if tz_name is not None or notify_hour is not None:
+            cursor.execute(
+                "SELECT timezone, notify_hour FROM Users WHERE user_id = %s",
+                (user_id,),
+            )
+            current = cursor.fetchone()
+            if current:
+                tz_name = tz_name if tz_name is not None else current[0]
+                notify_hour = notify_hour if notify_hour is not None else current[1]
+                cursor.execute(
+                    """
+                    UPDATE Users
+                    SET timezone = %s, notify_hour = %s, next_notify_at = %s
+                    WHERE user_id = %s
+                    """,
+                    (tz_name, notify_hour, next_window(user_id, tz_name, notify_hour), user_id),
+                )
         conn.commit()
 
         cursor.close()
@@ -0,0 +1,34 @@
+# routes/refresh_token.py
+from flask import Blueprint, request, jsonify
+from tokens import issue_access_token, rotate_refresh_token, RefreshTokenError
+
+refresh_bp = Blueprint("refresh_token", __name__)
+
+# POST /token/refresh  { "refresh_token": "..." }
+# Returns a new access token and the refresh token that replaces the one sent;
+# each refresh token works once.
+@refresh_bp.route("/token/refresh", methods=["POST"])
+def refresh():
+    data = request.get_json() or {}
+    raw = data.get("refresh_token") or ""
+
+    if not raw:
+        return jsonify({"error": "refresh_token is required"}), 400
+
+    try:
+        user_id, refresh_token = rotate_refresh_token(raw)
+    except RefreshTokenError as e:
+        return jsonify({"error": str(e)}), 401
+    except Exception as e:
+        print("TOKEN REFRESH ERROR:", repr(e))
+        return jsonify({"error": "Server error during token refresh"}), 500
+
+    token, expires_in = issue_access_token(user_id)
+    return jsonify(
+        {
+            "token": token,
+            "expires_in": expires_in,
+            "refresh_token": refresh_token,
+            "user_id": user_id,
+        }
+    ), 200
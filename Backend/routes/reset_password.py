@@ -1,7 +1,8 @@
 # backend/routes/reset_password.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-import bcrypt
+from passwords import hash_password, HashingOverloaded
+from tokens import revoke_user_refresh_tokens
 
 reset_password_bp = Blueprint("reset_password", __name__)
 
@@ -57,10 +58,19 @@ def reset_password():
             conn.close()
             return jsonify({"error": "Security answer is incorrect"}), 400
 
+        # No connection is held while hashing: the hash pool admits more
+        # jobs than the DB pool has connections
+        cursor.close()
+        conn.close()
+
         #  4) Hash new password & update 
-        hashed_bytes = bcrypt.hashpw(new_password.encode("utf-8"), bcrypt.gensalt())
-        hashed_str = hashed_bytes.decode("utf-8")
+        try:
+            hashed_str = hash_password(new_password)
+        except HashingOverloaded as e:
+            return jsonify({"error": e.message}), e.status_code, e.headers
 
+        conn = get_connection()
+        cursor = conn.cursor()
         cursor.execute(
             """
             UPDATE Users
@@ -69,6 +79,8 @@ def reset_password():
             """,
             (hashed_str, user["user_id"]),
         )
+        # Sessions opened with the old password must not outlive it
+        revoke_user_refresh_tokens(cursor, user["user_id"])
         conn.commit()
 
         cursor.close()
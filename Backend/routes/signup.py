@@ -1,7 +1,7 @@
 # routes/signup.py
 from flask import Blueprint, request, jsonify
 from db import get_connection
-import bcrypt
+from passwords import hash_password, HashingOverloaded
 
 signup_bp = Blueprint("signup", __name__)
 
@@ -18,13 +18,15 @@ def signup():
     if not all([username, email, password, security_question, security_answer]):
         return jsonify({"error": "All fields are required"}), 400
 
+    try:
+        hashed_pw = hash_password(password)
+    except HashingOverloaded as e:
+        return jsonify({"error": e.message}), e.status_code, e.headers
+
     try:
         conn = get_connection()
         cursor = conn.cursor()
 
-        hashed_pw = bcrypt.hashpw(password.encode("utf-8"),
-                                  bcrypt.gensalt()).decode("utf-8")
-
         cursor.execute(
             """
             INSERT INTO Users (username, email, password, security_question, security_answer)
@@ -32,6 +34,11 @@ def signup():
             """,
             (username, email, hashed_pw, security_question, security_answer),
         )
+        # Empty aggregates, so the first transaction write has nothing to seed
+        cursor.execute(
+            "INSERT INTO UserSummaries (user_id) VALUES (%s)",
+            (cursor.lastrowid,),
+        )
         conn.commit()
 
         return jsonify({"message": "User created"}), 201
@@ -1,24 +1,142 @@
 # routes/transactions.py
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response
 from db import get_connection
-from auth_utils import get_user_id_from_token
+from auth_utils import login_required
+from pagination import parse_limit, encode_cursor, decode_cursor
+from validation import validate_amount_and_date
+from aggregates import apply_transaction_deltas, ensure_user_aggregates
+from datetime import datetime, timedelta
+import csv
+import json
+import math
+import re
 
 transactions_bp = Blueprint("transactions", __name__)
 
+# InnoDB's default innodb_ft_min_token_size; shorter words never match FULLTEXT
+FULLTEXT_MIN_WORD = 3
+
+# Bulk import: rows per executemany() + commit, and how many row errors to report
+BULK_BATCH_SIZE = 500
+BULK_MAX_ERRORS = 1000
+
+# Export: rows pulled from the server-side cursor per fetchmany()
+EXPORT_FETCH_SIZE = 1000
+EXPORT_COLUMNS = ["transaction_id", "date", "type", "amount", "category_id", "category_name", "note"]
+
+
+def _parse_date(value):
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def build_transaction_filters(user_id, args):
+    """
+    Translates the list filters in the query string into SQL predicates on
+    the `t` (Transactions) alias.
+
+    Supported params:
+        from, to         inclusive YYYY-MM-DD bounds on t.date
+        type             income | expense
+        category_id      repeatable and/or comma separated ids
+        min_amount, max_amount
+        q                words to search for in the note
+
+    Returns:
+        (where_clauses, params, error_message)
+    """
+    where = ["t.user_id = %s"]
+    params = [user_id]
+
+    try:
+        if args.get("from"):
+            where.append("t.date >= %s")
+            params.append(_parse_date(args.get("from")))
+        if args.get("to"):
+            # half-open range keeps the predicate sargable
+            where.append("t.date < %s")
+            params.append(_parse_date(args.get("to")) + timedelta(days=1))
+    except ValueError:
+        return None, None, "from/to must be in YYYY-MM-DD format"
+
+    type_ = (args.get("type") or "").strip().lower()
+    if type_:
+        if type_ not in ("income", "expense"):
+            return None, None, "type must be income or expense"
+        where.append("t.type = %s")
+        params.append(type_)
+
+    raw_ids = [part for value in args.getlist("category_id") for part in value.split(",")]
+    raw_ids = [part.strip() for part in raw_ids if part.strip()]
+    if raw_ids:
+        try:
+            category_ids = sorted({int(part) for part in raw_ids})
+        except ValueError:
+            return None, None, "category_id must be an integer"
+        where.append(f"t.category_id IN ({', '.join(['%s'] * len(category_ids))})")
+        params.extend(category_ids)
+
+    try:
+        for key, op in (("min_amount", ">="), ("max_amount", "<=")):
+            if args.get(key):
+                bound = float(args.get(key))
+                if not math.isfinite(bound):
+                    raise ValueError(key)
+                where.append(f"t.amount {op} %s")
+                params.append(bound)
+    except ValueError:
+        return None, None, "min_amount/max_amount must be valid numbers"
+
+    q = (args.get("q") or "").strip()
+    if q:
+        words = re.findall(r"\w+", q)
+        long_words = [w for w in words if len(w) >= FULLTEXT_MIN_WORD]
+        if long_words:
+            # every word must appear (as a prefix), via the ft_txn_note index
+            where.append("MATCH(t.note) AGAINST (%s IN BOOLEAN MODE)")
+            params.append(" ".join(f"+{w}*" for w in long_words))
+        else:
+            escaped = q.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            where.append("t.note LIKE %s")
+            params.append(f"%{escaped}%")
+
+    return where, params, None
+
 
 # GET /transactions
+# Keyset-paginated, newest first. Pass ?limit=N (max 500) and the value of the
+# X-Next-Cursor response header as ?cursor= to fetch the next page.
+# Accepts the filters documented in build_transaction_filters().
 @transactions_bp.route("/transactions", methods=["GET"])
-def list_transactions():
-    user_id, error = get_user_id_from_token()
+@login_required
+def list_transactions(user_id):
+    limit, error = parse_limit(request.args.get("limit"))
+    if error:
+        return jsonify({"error": error}), 400
+
+    cursor_values, error = decode_cursor(request.args.get("cursor"), ("date", "id"))
+    if error:
+        return jsonify({"error": error}), 400
+
+    where, params, error = build_transaction_filters(user_id, request.args)
     if error:
-        return jsonify({"error": error}), 401
+        return jsonify({"error": error}), 400
+
+    if cursor_values:
+        try:
+            after_date = datetime.strptime(cursor_values["date"], "%Y-%m-%d").date()
+            after_id = int(cursor_values["id"])
+        except Exception:
+            return jsonify({"error": "Invalid cursor"}), 400
+        where.append("(t.date < %s OR (t.date = %s AND t.transaction_id < %s))")
+        params.extend([after_date, after_date, after_id])
 
     try:
         conn = get_connection()
         cursor = conn.cursor(dictionary=True)
 
+        # Walks idx_txn_user_date_id (or a narrower filter index), so every page costs the same
         cursor.execute(
-            """
+            f"""
             SELECT 
               t.transaction_id,
               t.amount,
@@ -29,29 +147,161 @@ def list_transactions():
               c.name AS category_name
             FROM Transactions t
             LEFT JOIN Categories c ON t.category_id = c.category_id
-            WHERE t.user_id = %s
+            WHERE {" AND ".join(where)}
             ORDER BY t.date DESC, t.transaction_id DESC
+            LIMIT %s
             """,
-            (user_id,),
+            (*params, limit + 1),
         )
 
         rows = cursor.fetchall()
         cursor.close()
         conn.close()
 
-        return jsonify(rows)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            last = rows[-1]
+            next_cursor = encode_cursor(
+                {"date": last["date"].isoformat(), "id": last["transaction_id"]}
+            )
+
+        response = jsonify(rows)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+        return response
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
-# POST /transactions
-@transactions_bp.route("/transactions", methods=["POST"])
-def add_transaction():
-    user_id, error = get_user_id_from_token()
+# GET /transactions/export?format=csv|ndjson
+# Streams the full (optionally filtered) history, oldest first. Rows are read
+# from an unbuffered cursor with fetchmany(), so memory stays flat and the
+# first bytes go out before the query has finished.
+@transactions_bp.route("/transactions/export", methods=["GET"])
+@login_required
+def export_transactions(user_id):
+    fmt = (request.args.get("format") or "csv").lower()
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+
+    where, params, error = build_transaction_filters(user_id, request.args)
     if error:
-        return jsonify({"error": error}), 401
+        return jsonify({"error": error}), 400
+
+    conn = None
+    try:
+        conn = get_connection()
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(
+            f"""
+            SELECT
+              t.transaction_id,
+              t.date,
+              t.type,
+              t.amount,
+              t.category_id,
+              c.name AS category_name,
+              t.note
+            FROM Transactions t
+            LEFT JOIN Categories c ON t.category_id = c.category_id
+            WHERE {" AND ".join(where)}
+            ORDER BY t.date, t.transaction_id
+            """,
+            tuple(params),
+        )
+    except Exception as e:
+        if conn is not None:
+            # The unbuffered cursor may be mid-result: don't pool it
+            conn.invalidate()
+        return jsonify({"error": str(e)}), 500
+
+    if fmt == "csv":
+        body = _export_csv(conn, cursor)
+        mimetype, ext = "text/csv", "csv"
+    else:
+        body = _export_ndjson(conn, cursor)
+        mimetype, ext = "application/x-ndjson", "ndjson"
+
+    return Response(
+        body,
+        mimetype=mimetype,
+        headers={
+            "Content-Disposition": f"attachment; filename=transactions.{ext}",
+            "X-Accel-Buffering": "no",
+        },
+    )
+
+
+def _stream_rows(conn, cursor, render, header=None):
+    """
+    Yields `header` (if any), then render(row) for each result row, reading
+    in fetchmany() chunks, and always releases the connection.
+    """
+    finished = False
+    try:
+        if header is not None:
+            yield header
+        while True:
+            chunk = cursor.fetchmany(EXPORT_FETCH_SIZE)
+            if not chunk:
+                break
+            for row in chunk:
+                yield render(row)
+        finished = True
+    finally:
+        if finished:
+            cursor.close()
+            conn.close()
+        else:
+            # Client went away mid-stream: drop the connection rather than
+            # draining the rest of the result set to make it reusable.
+            conn.invalidate()
+
+
+class _LineBuffer:
+    """Minimal file-like target so csv.writer can hand back one line at a time."""
+
+    def __init__(self):
+        self.value = ""
+
+    def write(self, text):
+        self.value = text
+
+
+def _export_csv(conn, cursor):
+    buffer = _LineBuffer()
+    writer = csv.writer(buffer)
+
+    def render(row):
+        writer.writerow(_export_value(v) for v in row)
+        return buffer.value
+
+    writer.writerow(EXPORT_COLUMNS)
+    return _stream_rows(conn, cursor, render, header=buffer.value)
+
+
+def _export_ndjson(conn, cursor):
+    def render(row):
+        record = {k: _export_value(v) for k, v in zip(EXPORT_COLUMNS, row)}
+        return json.dumps(record) + "\n"
+
+    return _stream_rows(conn, cursor, render)
+
+
+def _export_value(value):
+    if value is None or isinstance(value, (int, str)):
+        return value
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)  # Decimal amounts keep their exact 2dp representation
 
+
+# POST /transactions
+@transactions_bp.route("/transactions", methods=["POST"])
+@login_required
+def add_transaction(user_id):
     data = request.get_json() or {}
 
     amount = data.get("amount")
@@ -66,7 +316,12 @@ def add_transaction():
     if type_ not in ("income", "expense"):
         return jsonify({"error": "type must be income or expense"}), 400
 
+    amount, error = validate_amount_and_date(amount, date)
+    if error:
+        return jsonify({"error": error}), 400
+
     try:
+        ensure_user_aggregates(user_id)
         conn = get_connection()
         cursor = conn.cursor()
 
@@ -77,8 +332,13 @@ def add_transaction():
             """,
             (user_id, category_id, amount, date, type_, note),
         )
-        conn.commit()
         new_id = cursor.lastrowid
+        apply_transaction_deltas(
+            cursor,
+            user_id,
+            added=[{"amount": amount, "type": type_, "date": date, "category_id": category_id}],
+        )
+        conn.commit()
 
         cursor.close()
         conn.close()
@@ -89,30 +349,224 @@ def add_transaction():
         return jsonify({"error": str(e)}), 500
 
 
-# DELETE /transactions/<id>
-@transactions_bp.route("/transactions/<int:transaction_id>", methods=["DELETE"])
-def delete_transaction(transaction_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
+# POST /transactions/bulk
+# Streams a CSV (Content-Type: text/csv, with a header row) or NDJSON
+# (application/x-ndjson, one JSON object per line) body. Each row needs
+# amount, date and type, and may carry category_id or a category name plus a note.
+@transactions_bp.route("/transactions/bulk", methods=["POST"])
+@login_required
+def bulk_import_transactions(user_id):
+    content_type = (request.mimetype or "").lower()
+    if content_type in ("text/csv", "application/csv"):
+        rows = _iter_csv_rows(request.stream)
+    elif content_type in ("application/x-ndjson", "application/ndjson", "application/jsonl"):
+        rows = _iter_ndjson_rows(request.stream)
+    else:
+        return jsonify({"error": "Content-Type must be text/csv or application/x-ndjson"}), 415
+
+    inserted = 0
+    failed = 0
+    errors = []
+
+    def report(row_no, message):
+        nonlocal failed
+        failed += 1
+        if len(errors) < BULK_MAX_ERRORS:
+            errors.append({"row": row_no, "error": message})
 
     try:
+        ensure_user_aggregates(user_id)
         conn = get_connection()
         cursor = conn.cursor()
 
+        cursor.execute(
+            "SELECT category_id, LOWER(name) FROM Categories WHERE user_id = %s",
+            (user_id,),
+        )
+        categories = cursor.fetchall()
+        category_ids = {cid for cid, _ in categories}
+        category_by_name = {name: cid for cid, name in categories}
+
+        batch = []
+        for row_no, row, parse_error in rows:
+            if parse_error:
+                report(row_no, parse_error)
+                continue
+
+            values, row_error = _validate_bulk_row(
+                user_id, row, category_ids, category_by_name
+            )
+            if row_error:
+                report(row_no, row_error)
+                continue
+
+            batch.append((row_no, values))
+            if len(batch) >= BULK_BATCH_SIZE:
+                inserted += _insert_batch(conn, cursor, user_id, batch, report)
+                batch = []
+
+        if batch:
+            inserted += _insert_batch(conn, cursor, user_id, batch, report)
+
+        cursor.close()
+        conn.close()
+
+    except Exception as e:
+        return jsonify({"error": str(e), "inserted": inserted}), 500
+
+    return jsonify(
+        {
+            "message": "Bulk import finished",
+            "inserted": inserted,
+            "failed": failed,
+            "errors": errors,
+            "errors_truncated": failed > len(errors),
+        }
+    ), 200
+
+
+def _iter_csv_rows(stream):
+    """Yields (row_no, row_dict, parse_error) while reading the body line by line."""
+    lines = (line.decode("utf-8-sig", errors="replace") for line in stream)
+    reader = csv.DictReader(lines)
+    while True:
+        # A malformed record is reported and skipped; the reader carries on
+        # with the next line, so later rows are still imported
+        try:
+            row = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield reader.line_num, None, f"Malformed CSV: {e}"
+            continue
+        fields = {
+            (k or "").strip().lower(): (v.strip() if isinstance(v, str) else v)
+            for k, v in row.items()
+        }
+        yield reader.line_num, fields, None
+
+
+def _iter_ndjson_rows(stream):
+    """Yields (row_no, row_dict, parse_error) for each non-blank line."""
+    for row_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield row_no, None, "Invalid JSON"
+            continue
+        if not isinstance(row, dict):
+            yield row_no, None, "Each line must be a JSON object"
+            continue
+        yield row_no, row, None
+
+
+def _validate_bulk_row(user_id, row, category_ids, category_by_name):
+    """Applies the POST /income and POST /expense rules plus type/category checks."""
+    amount, error = validate_amount_and_date(row.get("amount"), row.get("date"))
+    if error:
+        return None, error
+
+    type_ = str(row.get("type") or "").strip().lower()
+    if type_ not in ("income", "expense"):
+        return None, "type must be income or expense"
+
+    category_id = row.get("category_id")
+    category_name = str(row.get("category") or "").strip().lower()
+    if category_id not in (None, ""):
+        try:
+            category_id = int(category_id)
+        except (TypeError, ValueError):
+            return None, "category_id must be an integer"
+        if category_id not in category_ids:
+            return None, "Category not found"
+    elif category_name:
+        category_id = category_by_name.get(category_name)
+        if category_id is None:
+            return None, "Category not found"
+    else:
+        category_id = None
+
+    note = row.get("note") or None
+    if note is not None and len(str(note)) > 255:
+        return None, "note must be at most 255 characters"
+
+    return (user_id, category_id, amount, row.get("date"), type_, note), None
+
+
+def _delta_row(values):
+    _, category_id, amount, date, type_, _ = values
+    return {"amount": amount, "type": type_, "date": date, "category_id": category_id}
+
+
+def _insert_batch(conn, cursor, user_id, batch, report):
+    """
+    Inserts one batch with executemany() and commits it.
+    If the batch is rejected, retries row by row so only the bad rows fail.
+    """
+    query = """
+        INSERT INTO Transactions (user_id, category_id, amount, date, type, note)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """
+    try:
+        cursor.executemany(query, [values for _, values in batch])
+        apply_transaction_deltas(
+            cursor, user_id, added=[_delta_row(values) for _, values in batch]
+        )
+        conn.commit()
+        return len(batch)
+    except Exception:
+        conn.rollback()
+
+    inserted = 0
+    for row_no, values in batch:
+        try:
+            cursor.execute(query, values)
+            apply_transaction_deltas(cursor, user_id, added=[_delta_row(values)])
+            conn.commit()
+            inserted += 1
+        except Exception as e:
+            conn.rollback()
+            report(row_no, str(e))
+    return inserted
+
+
+# DELETE /transactions/<id>
+@transactions_bp.route("/transactions/<int:transaction_id>", methods=["DELETE"])
+@login_required
+def delete_transaction(transaction_id, user_id):
+    try:
+        ensure_user_aggregates(user_id)
+        conn = get_connection()
+        cursor = conn.cursor(dictionary=True)
+
+        cursor.execute(
+            """
+            SELECT amount, type, date, category_id
+            FROM Transactions
+            WHERE transaction_id = %s AND user_id = %s
+            FOR UPDATE
+            """,
+            (transaction_id, user_id),
+        )
+        old = cursor.fetchone()
+        if old is None:
+            cursor.close()
+            conn.close()
+            return jsonify({"error": "Transaction not found"}), 404
+
         cursor.execute(
             "DELETE FROM Transactions WHERE transaction_id = %s AND user_id = %s",
             (transaction_id, user_id),
         )
+        apply_transaction_deltas(cursor, user_id, removed=[old])
         conn.commit()
-        deleted = cursor.rowcount
 
         cursor.close()
         conn.close()
 
-        if deleted == 0:
-            return jsonify({"error": "Transaction not found"}), 404
-
         return jsonify({"message": "Transaction deleted"}), 200
 
     except Exception as e:
@@ -121,11 +575,8 @@ def delete_transaction(transaction_id):
 
 # PUT /transactions/<id>
 @transactions_bp.route("/transactions/<int:transaction_id>", methods=["PUT"])
-def update_transaction(transaction_id):
-    user_id, error = get_user_id_from_token()
-    if error:
-        return jsonify({"error": error}), 401
-
+@login_required
+def update_transaction(transaction_id, user_id):
     data = request.get_json() or {}
     amount = data.get("amount")
     type_ = data.get("type")
@@ -139,16 +590,27 @@ def update_transaction(transaction_id):
     if type_ not in ("income", "expense"):
         return jsonify({"error": "type must be income or expense"}), 400
 
+    amount, error = validate_amount_and_date(amount, date)
+    if error:
+        return jsonify({"error": error}), 400
+
     try:
+        ensure_user_aggregates(user_id)
         conn = get_connection()
-        cursor = conn.cursor()
+        cursor = conn.cursor(dictionary=True)
 
-        # ensure transaction belongs to this user
+        # ensure transaction belongs to this user (and lock it while we adjust aggregates)
         cursor.execute(
-            "SELECT transaction_id FROM Transactions WHERE transaction_id = %s AND user_id = %s",
+            """
+            SELECT amount, type, date, category_id
+            FROM Transactions
+            WHERE transaction_id = %s AND user_id = %s
+            FOR UPDATE
+            """,
             (transaction_id, user_id),
         )
-        if cursor.fetchone() is None:
+        old = cursor.fetchone()
+        if old is None:
             cursor.close()
             conn.close()
             return jsonify({"error": "Transaction not found"}), 404
@@ -165,6 +627,12 @@ def update_transaction(transaction_id):
             """,
             (category_id, amount, date, type_, note, transaction_id, user_id),
         )
+        apply_transaction_deltas(
+            cursor,
+            user_id,
+            removed=[old],
+            added=[{"amount": amount, "type": type_, "date": date, "category_id": category_id}],
+        )
         conn.commit()
 
         cursor.close()
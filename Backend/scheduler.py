@@ -0,0 +1,229 @@
+# scheduler.py
+"""
+Automated email jobs.
+
+The APScheduler instance only runs in the process that holds scheduler
+leadership (see leader.py), so any number of web workers or worker
+processes can call start_schedulers() and the jobs still run exactly once.
+"""
+import os
+import threading
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from job_runner import has_unfinished_run, run_sharded
+from leader import LeaderElector
+from outbox import EmailDigest, drain_outbox
+from routes.notifications import purge_old_notifications
+from tokens import purge_expired_refresh_tokens, purge_expired_stream_tokens
+from revocation import purge_expired_revocations
+from routes.budget_alerts import (
+    check_and_send_budget_alerts,
+    queue_budget_alert_emails,
+    queue_budget_alerts,
+)
+from routes.goal_reminders import check_and_send_goal_reminders, queue_goal_reminders
+from send_windows import NOTIFY_TICK_SECONDS, run_due_windows
+
+# 1 = deliver in per-user windows through the day, 0 = nightly 19:00 sweeps
+NOTIFY_WINDOWS = os.getenv("NOTIFY_WINDOWS", "1") == "1"
+# Budget alerts are logged on write and emailed in the user's window;
+# 1 also reconciles the alert levels before emailing
+BUDGET_ALERT_SWEEP = os.getenv("BUDGET_ALERT_SWEEP", "0") == "1"
+
+_scheduler = None
+_elector = None
+_lock = threading.Lock()
+
+
+def _notification_jobs():
+    return [
+        queue_goal_reminders,
+        queue_budget_alerts if BUDGET_ALERT_SWEEP else queue_budget_alert_emails,
+    ]
+
+
+def run_due_notifications():
+    return run_due_windows(_notification_jobs())
+
+
+def queue_nightly_notifications(cursor, users, today):
+    """
+    One chunk of the nightly sweep. Every job shares one digest, so a user
+    gets a single combined email, as in the delivery windows.
+    """
+    emails = EmailDigest()
+    queued = sum(work(cursor, users, today, emails) or 0 for work in _notification_jobs())
+    emails.flush(cursor)
+    return queued
+
+
+def run_nightly_notifications(take_over=False):
+    """Sharded sweep over all users; returns the number of items queued."""
+    return run_sharded("notifications", queue_nightly_notifications, take_over=take_over)
+
+
+def _add_nightly_sweeps(scheduler):
+    #  Reminders and budget alert emails → 7:00 PM
+    scheduler.add_job(
+        run_nightly_notifications,
+        trigger="cron",
+        hour=19,
+        minute=0,
+        id="nightly_notifications_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+
+def _build_scheduler():
+    """
+    - Goal reminders and budget alert emails (reconciled first if
+      BUDGET_ALERT_SWEEP=1): every NOTIFY_TICK_SECONDS for the users whose
+      delivery window is due (see send_windows), or with NOTIFY_WINDOWS=0 as
+      one sharded sweep daily at 19:00 (Asia/Karachi). Either way a user's
+      items share one digest. The in-app budget alert itself is logged on
+      write.
+    - Email outbox: drained every OUTBOX_POLL_SECONDS (default 30)
+    - Notification retention: daily at 03:00 (Asia/Karachi)
+
+    A sweep that stopped part-way through today is resumed on election.
+    """
+    scheduler = BackgroundScheduler(timezone="Asia/Karachi")
+
+    if NOTIFY_WINDOWS:
+        #  Reminders and alerts → each user's own window
+        scheduler.add_job(
+            run_due_notifications,
+            trigger="interval",
+            seconds=NOTIFY_TICK_SECONDS,
+            id="notify_windows_job",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+    else:
+        _add_nightly_sweeps(scheduler)
+
+    #  Email outbox → delivers whatever the jobs queued
+    scheduler.add_job(
+        drain_outbox,
+        trigger="interval",
+        seconds=int(os.getenv("OUTBOX_POLL_SECONDS", "30")),
+        id="email_outbox_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    #  Old notifications → archive, 3:00 AM
+    scheduler.add_job(
+        purge_old_notifications,
+        trigger="cron",
+        hour=3,
+        minute=0,
+        id="notification_retention_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    #  Expired refresh tokens → deleted, 3:15 AM
+    scheduler.add_job(
+        purge_expired_refresh_tokens,
+        trigger="cron",
+        hour=3,
+        minute=15,
+        id="refresh_token_purge_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    #  Unredeemed stream tokens → deleted, 3:15 AM
+    scheduler.add_job(
+        purge_expired_stream_tokens,
+        trigger="cron",
+        hour=3,
+        minute=15,
+        id="stream_token_purge_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    #  Revocations of already-expired tokens → deleted, 3:20 AM
+    scheduler.add_job(
+        purge_expired_revocations,
+        trigger="cron",
+        hour=3,
+        minute=20,
+        id="revoked_token_purge_job",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    # Resume today's sweeps if the previous leader died mid-run. Its shards
+    # may still be marked running, so take them over rather than wait out
+    # the lease: only the leader runs these jobs.
+    for job_name, func in (
+        ("notifications", run_nightly_notifications),
+        ("goal_reminders", check_and_send_goal_reminders),
+        ("budget_alerts", check_and_send_budget_alerts),
+    ):
+        try:
+            if has_unfinished_run(job_name):
+                scheduler.add_job(
+                    func,
+                    kwargs={"take_over": True},
+                    id=f"{job_name}_resume",
+                    replace_existing=True,
+                )
+        except Exception as e:
+            print(f"Could not check {job_name} checkpoints:", repr(e))
+
+    return scheduler
+
+
+def _start_jobs():
+    global _scheduler
+    with _lock:
+        if _scheduler and _scheduler.running:
+            return
+        _scheduler = _build_scheduler()
+        _scheduler.start()
+    print("✔ Automatic Email Schedulers Started")
+
+
+def _stop_jobs():
+    global _scheduler
+    with _lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler and scheduler.running:
+        # Running jobs finish in the background; their checkpoints let the
+        # next leader pick up whatever they leave unfinished.
+        scheduler.shutdown(wait=False)
+        print("✔ Automatic Email Schedulers Stopped")
+
+
+def start_schedulers():
+    """Joins the leader election; the jobs start once this process is elected."""
+    global _elector
+    if _elector is None:
+        _elector = LeaderElector(on_elected=_start_jobs, on_demoted=_stop_jobs)
+    _elector.start()
+
+
+def stop_schedulers():
+    if _elector is not None:
+        _elector.stop()
+
+
+def scheduler_status():
+    return {
+        "is_leader": bool(_elector and _elector.is_leader),
+        "running": bool(_scheduler and _scheduler.running),
+        "jobs": [job.id for job in _scheduler.get_jobs()] if _scheduler else [],
+    }
@@ -0,0 +1,198 @@
+# send_windows.py
+"""
+Per-user delivery windows for reminders and alerts.
+
+Each user has a timezone and a local notify_hour; within that hour the user
+gets a fixed minute derived from their user_id, so users sharing a timezone
+and hour are spread over sixty one-minute slots. Users.next_notify_at holds
+the next slot in UTC.
+
+run_due_windows() runs every NOTIFY_TICK_SECONDS and processes only users
+whose slot has passed, in batches of NOTIFY_BATCH_SIZE. A batch's work and
+the advance of next_notify_at commit together, so each user is handled once
+per day; a failed batch is retried NOTIFY_RETRY_MINUTES later.
+"""
+import os
+import traceback
+import zlib
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from db import get_connection
+from job_runner import JOB_WORKERS
+from outbox import EmailDigest
+
+DEFAULT_TIMEZONE = os.getenv("DEFAULT_TIMEZONE", "Asia/Karachi")
+DEFAULT_NOTIFY_HOUR = 19
+NOTIFY_BATCH_SIZE = int(os.getenv("NOTIFY_BATCH_SIZE", "200"))
+NOTIFY_TICK_SECONDS = int(os.getenv("NOTIFY_TICK_SECONDS", "60"))
+NOTIFY_SEED_BATCH = 1000
+NOTIFY_RETRY_MINUTES = 5
+
+
+def get_zone(name):
+    """ZoneInfo for `name`, or None when it is not a known IANA timezone."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError, TypeError):
+        return None
+
+
+def _zone_or_default(name):
+    return get_zone(name) or ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def window_minute(user_id):
+    """Stable per-user minute offset within the notify hour."""
+    return zlib.crc32(str(user_id).encode()) % 60
+
+
+def local_today(tz_name, now_utc=None):
+    now_utc = now_utc or datetime.now(timezone.utc)
+    return now_utc.astimezone(_zone_or_default(tz_name)).date()
+
+
+def next_window(user_id, tz_name, notify_hour, now_utc=None):
+    """Next delivery slot strictly after `now_utc`, as a naive UTC datetime."""
+    now_utc = now_utc or datetime.now(timezone.utc)
+    local_now = now_utc.astimezone(_zone_or_default(tz_name))
+    slot = local_now.replace(
+        hour=notify_hour, minute=window_minute(user_id), second=0, microsecond=0
+    )
+    if slot <= local_now:
+        slot += timedelta(days=1)
+    return slot.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def _seed_missing_windows(conn):
+    """Gives users without a slot (new users, first deploy) their next one."""
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(
+        """
+        SELECT user_id, timezone, notify_hour
+        FROM Users
+        WHERE next_notify_at IS NULL
+        LIMIT %s
+        """,
+        (NOTIFY_SEED_BATCH,),
+    )
+    users = cursor.fetchall()
+    if users:
+        cursor.executemany(
+            "UPDATE Users SET next_notify_at = %s WHERE user_id = %s AND next_notify_at IS NULL",
+            [
+                (next_window(u["user_id"], u["timezone"], u["notify_hour"]), u["user_id"])
+                for u in users
+            ],
+        )
+    conn.commit()
+    cursor.close()
+    return len(users)
+
+
+def _process_due_batch(jobs):
+    """
+    Locks one batch of due users, runs every job for them and moves their
+    slot to the next day. Returns (users, items queued).
+    """
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    users = []
+    try:
+        cursor.execute(
+            """
+            SELECT user_id, timezone, notify_hour
+            FROM Users
+            WHERE next_notify_at <= UTC_TIMESTAMP()
+            ORDER BY next_notify_at
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            (NOTIFY_BATCH_SIZE,),
+        )
+        users = cursor.fetchall()
+        if not users:
+            conn.commit()
+            return 0, 0
+
+        # Jobs work on the users' local date, so group by it
+        now = datetime.now(timezone.utc)
+        by_day = defaultdict(list)
+        for u in users:
+            by_day[local_today(u["timezone"], now)].append(u["user_id"])
+
+        # One digest across all jobs: a user gets a single combined email
+        emails = EmailDigest()
+        queued = 0
+        for day, user_ids in by_day.items():
+            for work in jobs:
+                queued += work(cursor, user_ids, day, emails) or 0
+        emails.flush(cursor)
+
+        cursor.executemany(
+            "UPDATE Users SET next_notify_at = %s WHERE user_id = %s",
+            [
+                (next_window(u["user_id"], u["timezone"], u["notify_hour"], now), u["user_id"])
+                for u in users
+            ],
+        )
+        conn.commit()
+        return len(users), queued
+    except Exception:
+        conn.rollback()
+        if users:
+            # Push the failed batch back a little so it does not block the queue
+            cursor.execute(
+                f"""
+                UPDATE Users
+                SET next_notify_at = UTC_TIMESTAMP() + INTERVAL %s MINUTE
+                WHERE user_id IN ({", ".join(["%s"] * len(users))})
+                """,
+                (NOTIFY_RETRY_MINUTES, *[u["user_id"] for u in users]),
+            )
+            conn.commit()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _drain_due(jobs):
+    users_total = queued_total = 0
+    while True:
+        try:
+            users, queued = _process_due_batch(jobs)
+        except Exception:
+            traceback.print_exc()
+            break
+        users_total += users
+        queued_total += queued
+        if users < NOTIFY_BATCH_SIZE:
+            break
+    return users_total, queued_total
+
+
+def run_due_windows(jobs, workers=None):
+    """
+    Runs each of `jobs` (work(cursor, user_ids, local_date, emails) -> int,
+    no commit) for the users whose window is due. Up to `workers` threads
+    take disjoint batches thanks to SKIP LOCKED. Returns items queued.
+    """
+    workers = workers or JOB_WORKERS
+
+    conn = get_connection()
+    try:
+        _seed_missing_windows(conn)
+    finally:
+        conn.close()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="windows") as pool:
+        results = list(pool.map(lambda _: _drain_due(jobs), range(workers)))
+
+    users = sum(r[0] for r in results)
+    queued = sum(r[1] for r in results)
+    if users:
+        print(f"✔ Delivery windows: {users} user(s) due, {queued} item(s) queued")
+    return queued
@@ -0,0 +1,306 @@
+# tokens.py
+"""
+Access and refresh tokens.
+
+Access tokens are short-lived HS256 JWTs (ACCESS_TOKEN_MINUTES) verified
+without the database. Refresh tokens are opaque "<token_id>.<secret>"
+strings; only sha256(secret) is stored, in RefreshTokens under the
+token_id primary key, so renewing a session is one indexed row lookup and
+a constant-time compare instead of a bcrypt password check.
+
+Refresh tokens rotate: each use revokes the presented token and issues
+its successor in the same family. Presenting an already-rotated token
+means it was copied, so the whole family is revoked and the user has to
+log in again.
+
+Stream tokens let EventSource, which cannot send headers, open the SSE
+stream without putting the access token in a URL (and so in access logs):
+a random, single-use ticket valid for STREAM_TOKEN_SECONDS, stored like a
+refresh token as its sha256 only.
+"""
+import hashlib
+import hmac
+import os
+import secrets
+from datetime import datetime, timedelta
+
+import jwt
+from flask import current_app
+
+from db import get_connection
+
+ACCESS_TOKEN_MINUTES = int(os.getenv("ACCESS_TOKEN_MINUTES", "15"))
+REFRESH_TOKEN_DAYS = int(os.getenv("REFRESH_TOKEN_DAYS", "30"))
+# Two tabs refreshing at once present the same token; the loser is refused
+# without revoking the family if the token was rotated this recently.
+REFRESH_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_REUSE_GRACE_SECONDS", "10"))
+REFRESH_PURGE_CHUNK = 1000
+STREAM_TOKEN_SECONDS = int(os.getenv("STREAM_TOKEN_SECONDS", "60"))
+
+
+class RefreshTokenError(Exception):
+    pass
+
+
+def issue_access_token(user_id):
+    """Returns (token, expires_in_seconds). jti identifies the token for logout."""
+    exp = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_MINUTES)
+    token = jwt.encode(
+        {"user_id": user_id, "exp": exp, "jti": secrets.token_hex(16)},
+        current_app.config["SECRET_KEY"],
+        algorithm="HS256",
+    )
+    return token, ACCESS_TOKEN_MINUTES * 60
+
+
+def _digest(secret):
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()
+
+
+def _split(raw):
+    token_id, _, secret = (raw or "").partition(".")
+    if len(token_id) != 32 or not secret:
+        raise RefreshTokenError("Invalid refresh token")
+    return token_id, secret
+
+
+def issue_refresh_token(cursor, user_id, family_id=None):
+    """
+    Stores a new refresh token and returns (raw_token, token_id).
+    Does not commit: the caller's transaction decides.
+    """
+    token_id = secrets.token_hex(16)
+    secret = secrets.token_urlsafe(32)
+    cursor.execute(
+        """
+        INSERT INTO RefreshTokens (token_id, family_id, user_id, token_hash, expires_at)
+        VALUES (%s, %s, %s, %s, %s)
+        """,
+        (
+            token_id,
+            family_id or token_id,
+            user_id,
+            _digest(secret),
+            datetime.utcnow() + timedelta(days=REFRESH_TOKEN_DAYS),
+        ),
+    )
+    return f"{token_id}.{secret}", token_id
+
+
+def _revoke_family(cursor, family_id):
+    cursor.execute(
+        """
+        UPDATE RefreshTokens
+        SET revoked_at = UTC_TIMESTAMP()
+        WHERE family_id = %s AND revoked_at IS NULL
+        """,
+        (family_id,),
+    )
+
+
+def revoke_user_refresh_tokens(cursor, user_id):
+    """Ends every refresh session of a user (e.g. after a password reset). Does not commit."""
+    cursor.execute(
+        """
+        UPDATE RefreshTokens
+        SET revoked_at = UTC_TIMESTAMP()
+        WHERE user_id = %s AND revoked_at IS NULL
+        """,
+        (user_id,),
+    )
+
+
+def revoke_refresh_token(raw):
+    """
+    Revokes the family of a refresh token (logout). Unknown or mismatched
+    tokens are ignored. Returns True if a matching token was found.
+    """
+    try:
+        token_id, secret = _split(raw)
+    except RefreshTokenError:
+        return False
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            "SELECT family_id, token_hash FROM RefreshTokens WHERE token_id = %s",
+            (token_id,),
+        )
+        row = cursor.fetchone()
+        if not row or not hmac.compare_digest(row["token_hash"], _digest(secret)):
+            return False
+        _revoke_family(cursor, row["family_id"])
+        conn.commit()
+        return True
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def rotate_refresh_token(raw):
+    """
+    Exchanges a refresh token for its successor.
+    Returns (user_id, new_raw_token); raises RefreshTokenError when the token
+    is unknown, expired or revoked. Reuse of a rotated token revokes its family.
+    """
+    token_id, secret = _split(raw)
+
+    conn = get_connection()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute(
+            """
+            SELECT token_id, family_id, user_id, token_hash, expires_at, revoked_at, replaced_by
+            FROM RefreshTokens
+            WHERE token_id = %s
+            FOR UPDATE
+            """,
+            (token_id,),
+        )
+        row = cursor.fetchone()
+        if not row or not hmac.compare_digest(row["token_hash"], _digest(secret)):
+            conn.rollback()
+            raise RefreshTokenError("Invalid refresh token")
+
+        if row["revoked_at"] is not None:
+            just_rotated = row["replaced_by"] is not None and (
+                datetime.utcnow() - row["revoked_at"]
+                < timedelta(seconds=REFRESH_REUSE_GRACE_SECONDS)
+            )
+            if just_rotated:
+                conn.rollback()
+                raise RefreshTokenError("Refresh token has already been used")
+            _revoke_family(cursor, row["family_id"])
+            conn.commit()
+            print(f"Refresh token reuse for user {row['user_id']}: family revoked")
+            raise RefreshTokenError("Refresh token has been revoked")
+
+        if row["expires_at"] <= datetime.utcnow():
+            conn.rollback()
+            raise RefreshTokenError("Refresh token has expired")
+
+        new_raw, new_id = issue_refresh_token(cursor, row["user_id"], row["family_id"])
+        cursor.execute(
+            """
+            UPDATE RefreshTokens
+            SET revoked_at = UTC_TIMESTAMP(), replaced_by = %s
+            WHERE token_id = %s
+            """,
+            (new_id, token_id),
+        )
+        conn.commit()
+        return row["user_id"], new_raw
+    except RefreshTokenError:
+        raise
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purge_expired_refresh_tokens():
+    """Deletes refresh tokens past their expiry, in small chunks. Returns the count."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    removed = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM RefreshTokens WHERE expires_at < UTC_TIMESTAMP() LIMIT %s",
+                (REFRESH_PURGE_CHUNK,),
+            )
+            conn.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < REFRESH_PURGE_CHUNK:
+                break
+    finally:
+        cursor.close()
+        conn.close()
+
+    if removed:
+        print(f"✔ Refresh tokens: {removed} expired row(s) deleted")
+    return removed
+
+
+def issue_stream_token(user_id):
+    """Returns (raw_token, expires_in_seconds) for opening one SSE stream."""
+    raw = secrets.token_urlsafe(32)
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            INSERT INTO StreamTokens (token_hash, user_id, expires_at)
+            VALUES (%s, %s, UTC_TIMESTAMP() + INTERVAL %s SECOND)
+            """,
+            (_digest(raw), user_id, STREAM_TOKEN_SECONDS),
+        )
+        conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+    return raw, STREAM_TOKEN_SECONDS
+
+
+def consume_stream_token(raw):
+    """
+    Redeems a stream token: returns its user_id and deletes it, or None when
+    it is unknown, expired or already used.
+    """
+    if not raw:
+        return None
+    token_hash = _digest(raw)
+
+    conn = get_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            """
+            SELECT user_id, expires_at > UTC_TIMESTAMP()
+            FROM StreamTokens
+            WHERE token_hash = %s
+            FOR UPDATE
+            """,
+            (token_hash,),
+        )
+        row = cursor.fetchone()
+        if row is None:
+            conn.rollback()
+            return None
+        cursor.execute("DELETE FROM StreamTokens WHERE token_hash = %s", (token_hash,))
+        conn.commit()
+        user_id, live = row
+        return user_id if live else None
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def purge_expired_stream_tokens():
+    """Deletes stream tokens that were never redeemed. Returns the count."""
+    conn = get_connection()
+    cursor = conn.cursor()
+    removed = 0
+    try:
+        while True:
+            cursor.execute(
+                "DELETE FROM StreamTokens WHERE expires_at < UTC_TIMESTAMP() LIMIT %s",
+                (REFRESH_PURGE_CHUNK,),
+            )
+            conn.commit()
+            removed += cursor.rowcount
+            if cursor.rowcount < REFRESH_PURGE_CHUNK:
+                break
+    finally:
+        cursor.close()
+        conn.close()
+
+    if removed:
+        print(f"✔ Stream tokens: {removed} expired row(s) deleted")
+    return removed
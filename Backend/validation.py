@@ -0,0 +1,33 @@
+# validation.py
+import math
+from datetime import datetime
+
+
+def validate_amount_and_date(amount, date):
+    """
+    Shared rules for income / expense rows (POST /income, POST /expense,
+    POST/PUT /transactions, POST /transactions/bulk). The date format is the
+    one aggregates.py parses.
+
+    Returns:
+        (amount, error_message)
+        - amount: the amount as a float when valid, otherwise None
+    """
+    if not amount or not date:
+        return None, "Amount and date are required"
+
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        return None, "Amount must be a valid number"
+    if not math.isfinite(amount):
+        return None, "Amount must be a valid number"
+    if amount <= 0:
+        return None, "Amount must be greater than 0"
+
+    try:
+        datetime.strptime(date, "%Y-%m-%d")
+    except (TypeError, ValueError):
+        return None, "Date must be in YYYY-MM-DD format"
+
+    return amount, None
@@ -0,0 +1,39 @@
+# worker.py
+"""
+Standalone scheduler process:
+
+    python worker.py
+
+Run one or more of these next to the web servers (which then need no
+scheduler at all). Only the elected leader runs the jobs; the others take
+over if it stops.
+"""
+import signal
+import threading
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from scheduler import start_schedulers, stop_schedulers
+
+
+def main():
+    stopped = threading.Event()
+
+    def _shutdown(signum, frame):
+        stopped.set()
+
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
+
+    start_schedulers()
+    print("✔ Scheduler worker running (Ctrl+C to stop)")
+    stopped.wait()
+
+    stop_schedulers()
+    print("✔ Scheduler worker stopped")
+
+
+if __name__ == "__main__":
+    main()
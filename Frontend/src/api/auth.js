@@ -9,6 +9,16 @@ export function loginAPI(email, password) {
   return axios.post("/login", { email, password }).then((res) => res.data);
 }
 
+export function logoutAPI(token, refresh_token) {
+  return axios
+    .post(
+      "/logout",
+      { refresh_token },
+      { headers: { Authorization: `Bearer ${token}` } }
+    )
+    .then((res) => res.data);
+}
+
 
 export function forgotPasswordAPI(email, security_answer) {
   return axios
@@ -1,7 +1,9 @@
 import axios from "axios";
 
+const BASE_URL = "http://127.0.0.1:5000";
+
 const instance = axios.create({
-  baseURL: "http://127.0.0.1:5000",
+  baseURL: BASE_URL,
 });
 
 instance.interceptors.request.use((config) => {
@@ -12,4 +14,70 @@ instance.interceptors.request.use((config) => {
   return config;
 });
 
+// Access tokens are short-lived. On a 401, trade the refresh token for a new
+// pair once and retry the request. Concurrent 401s share one refresh call,
+// since each refresh token can only be used once.
+let refreshing = null;
+
+function refreshTokens() {
+  const refreshToken = localStorage.getItem("refreshToken");
+  if (!refreshToken) {
+    return Promise.reject(new Error("No refresh token"));
+  }
+  return axios
+    .post(`${BASE_URL}/token/refresh`, { refresh_token: refreshToken })
+    .then((res) => {
+      localStorage.setItem("token", res.data.token);
+      localStorage.setItem("refreshToken", res.data.refresh_token);
+      return res.data.token;
+    });
+}
+
+function endSession() {
+  localStorage.removeItem("token");
+  localStorage.removeItem("refreshToken");
+  localStorage.removeItem("userId");
+  localStorage.removeItem("user");
+  if (window.location.pathname !== "/login") {
+    window.location.assign("/login");
+  }
+}
+
+instance.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const isAuthCall = ["/login", "/logout", "/signup", "/token/refresh"].includes(original?.url);
+
+    if (error.response?.status !== 401 || !original || original._retried || isAuthCall) {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+
+    // Another tab may already have rotated the pair: use its token if so
+    const sentToken = original.headers?.Authorization?.replace("Bearer ", "");
+    const currentToken = localStorage.getItem("token");
+    if (currentToken && currentToken !== sentToken) {
+      return instance(original);
+    }
+
+    if (!refreshing) {
+      refreshing = refreshTokens().finally(() => {
+        refreshing = null;
+      });
+    }
+    try {
+      await refreshing;
+    } catch {
+      // Lost a refresh race with another tab: it stored the new pair
+      if (localStorage.getItem("token") !== sentToken) {
+        return instance(original);
+      }
+      endSession();
+      return Promise.reject(error);
+    }
+    return instance(original);
+  }
+);
+
 export default instance;
@@ -6,8 +6,11 @@ export function getDashboardAPI() {
 }
 
 
-export function getIncomeExpenseAPI() {
-  return axios.get("/charts/income-expense").then((res) => res.data);
+// params: { granularity: "day" | "week" | "month", from, to }
+export function getIncomeExpenseAPI(params = {}) {
+  return axios
+    .get("/charts/income-expense", { params })
+    .then((res) => res.data);
 }
 
 export function getCategorySpendingAPI() {
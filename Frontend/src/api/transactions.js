@@ -1,7 +1,15 @@
 import axios from "./axiosInstance";
 
-export function getTransactionsAPI() {
-  return axios.get("/transactions").then((res) => res.data);
+export function getTransactionsAPI(params = {}) {
+  return axios.get("/transactions", { params }).then((res) => res.data);
+}
+
+// Returns one page plus the cursor for the next one (null on the last page)
+export function getTransactionsPageAPI(params = {}) {
+  return axios.get("/transactions", { params }).then((res) => ({
+    items: res.data,
+    nextCursor: res.headers["x-next-cursor"] || null,
+  }));
 }
 
 export function addTransactionAPI(body) {
@@ -14,4 +22,13 @@ export function deleteTransactionAPI(id) {
 
 export function updateTransactionAPI(id, body) {
   return axios.put(`/transactions/${id}`, body).then((res) => res.data);
-}
\ No newline at end of file
+}
+// file: a File/Blob with CSV (header row) or NDJSON content
+export function bulkImportTransactionsAPI(file) {
+  const isCsv = file.name?.toLowerCase().endsWith(".csv") || file.type === "text/csv";
+  return axios
+    .post("/transactions/bulk", file, {
+      headers: { "Content-Type": isCsv ? "text/csv" : "application/x-ndjson" },
+    })
+    .then((res) => res.data);
+}
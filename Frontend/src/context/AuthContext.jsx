@@ -1,6 +1,6 @@
 // src/context/AuthContext.js
 import { createContext, useContext, useEffect, useState } from "react";
-import { loginAPI, signupAPI } from "../api/auth";
+import { loginAPI, logoutAPI, signupAPI } from "../api/auth";
 
 const AuthContext = createContext(null);
 
@@ -43,8 +43,11 @@ export function AuthProvider({ children }) {
     const username = userPayload.username;
     const emailFromApi = userPayload.email || email;
 
-    // 3) Store token
+    // 3) Store token (and the refresh token that renews it)
     localStorage.setItem("token", newToken);
+    if (data.refresh_token) {
+      localStorage.setItem("refreshToken", data.refresh_token);
+    }
     if (userId) {
       localStorage.setItem("userId", String(userId));
     }
@@ -95,7 +98,13 @@ export function AuthProvider({ children }) {
   };
 
   const logout = () => {
+    // Revoke server-side too; the local session ends either way
+    const currentToken = localStorage.getItem("token");
+    if (currentToken) {
+      logoutAPI(currentToken, localStorage.getItem("refreshToken")).catch(() => {});
+    }
     localStorage.removeItem("token");
+    localStorage.removeItem("refreshToken");
     localStorage.removeItem("userId");
     localStorage.removeItem("user");
     setToken(null);
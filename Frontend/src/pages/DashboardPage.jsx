@@ -1,8 +1,11 @@
 // src/pages/DashboardPage.jsx
 import { useEffect, useState } from "react";
 import Sidebar from "../components/common/Sidebar";
-import { getDashboardAPI, getCategorySpendingAPI } from "../api/dashboard";
-import { getTransactionsAPI } from "../api/transactions";
+import {
+  getDashboardAPI,
+  getCategorySpendingAPI,
+  getIncomeExpenseAPI,
+} from "../api/dashboard";
 import {
   PieChart,
   Pie,
@@ -75,31 +78,17 @@ export default function DashboardPage() {
 
       setCategorySpending(pieData);
 
-      // 3) monthly income vs expense from transactions
-      const txs = await getTransactionsAPI();
-      let txList = [];
-      if (Array.isArray(txs)) {
-        txList = txs;
-      } else if (Array.isArray(txs?.transactions)) {
-        txList = txs.transactions;
-      }
-
-      const map = {};
-      txList.forEach((t) => {
-        const key = getMonthKey(t.date);
-        if (!map[key]) map[key] = { month: key, income: 0, expense: 0 };
-        const amt = Number(t.amount);
-        if (t.type === "income") map[key].income += amt;
-        else map[key].expense += amt;
+      // 3) monthly income vs expense (last 6 months, pre-aggregated on the server)
+      const series = await getIncomeExpenseAPI({ granularity: "month" });
+      const last6 = (series?.series || []).map((b) => {
+        const month = getMonthKey(`${b.period}T00:00:00`);
+        return {
+          month,
+          income: Number(b.income || 0),
+          expense: Number(b.expense || 0),
+          monthLabel: formatMonthLabel(month),
+        };
       });
-
-      const months = Object.values(map).sort((a, b) =>
-        a.month.localeCompare(b.month)
-      );
-      const last6 = months.slice(-6).map((m) => ({
-        ...m,
-        monthLabel: formatMonthLabel(m.month),
-      }));
       setIncomeExpenseByMonth(last6);
     } catch (err) {
       console.error("Dashboard load failed:", err);
@@ -1,7 +1,7 @@
 import { useEffect, useState } from "react";
 import Sidebar from "../components/common/Sidebar";
 import {
-  getTransactionsAPI,
+  getTransactionsPageAPI,
   addTransactionAPI,
   deleteTransactionAPI,
   updateTransactionAPI,
@@ -10,6 +10,8 @@ import { getCategoriesAPI, addCategoryAPI } from "../api/categories";
 
 export default function TransactionsPage() {
   const [transactions, setTransactions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   const [categories, setCategories] = useState([]);
 
   const [form, setForm] = useState({
@@ -30,12 +32,13 @@ export default function TransactionsPage() {
   const loadData = async () => {
     try {
       setError(null);
-      const [txs, cats] = await Promise.all([
-        getTransactionsAPI(),
+      const [page, cats] = await Promise.all([
+        getTransactionsPageAPI(),
         getCategoriesAPI(),
       ]);
 
-      setTransactions(Array.isArray(txs) ? txs : []);
+      setTransactions(Array.isArray(page.items) ? page.items : []);
+      setNextCursor(page.nextCursor);
       setCategories(Array.isArray(cats) ? cats : []);
     } catch (err) {
       console.error("Load transactions/categories failed:", err);
@@ -44,10 +47,27 @@ export default function TransactionsPage() {
           "Failed to load data. Is the backend running and are you logged in?"
       );
       setTransactions([]);
+      setNextCursor(null);
       setCategories([]);
     }
   };
 
+  // GET /transactions is paginated: follow X-Next-Cursor for older entries
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await getTransactionsPageAPI({ cursor: nextCursor });
+      setTransactions((prev) => [...prev, ...(page.items || [])]);
+      setNextCursor(page.nextCursor);
+    } catch (err) {
+      console.error("Load more transactions failed:", err);
+      setError(err.response?.data?.error || "Failed to load more transactions");
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     loadData();
   }, []);
@@ -283,64 +303,78 @@ export default function TransactionsPage() {
             </div>
 
             {hasTransactions ? (
-              <table className="table">
-                <thead>
-                  <tr>
-                    <th>Date</th>
-                    <th>Category</th>
-                    <th>Note</th>
-                    <th>Type</th>
-                    <th>Amount</th>
-                    <th>Actions</th>
-                  </tr>
-                </thead>
-                <tbody>
-                  {transactions.map((t) => (
-                    <tr key={t.transaction_id}>
-                      <td>{t.date}</td>
-                      <td>{t.category_name || "—"}</td>
-                      <td>{t.note || "—"}</td>
-                      <td>
-                        <span
+              <>
+                <table className="table">
+                  <thead>
+                    <tr>
+                      <th>Date</th>
+                      <th>Category</th>
+                      <th>Note</th>
+                      <th>Type</th>
+                      <th>Amount</th>
+                      <th>Actions</th>
+                    </tr>
+                  </thead>
+                  <tbody>
+                    {transactions.map((t) => (
+                      <tr key={t.transaction_id}>
+                        <td>{t.date}</td>
+                        <td>{t.category_name || "—"}</td>
+                        <td>{t.note || "—"}</td>
+                        <td>
+                          <span
+                            className={
+                              t.type === "income"
+                                ? "txn-tag txn-tag-income"
+                                : "txn-tag txn-tag-expense"
+                            }
+                          >
+                            {t.type === "income" ? "Income" : "Expense"}
+                          </span>
+                        </td>
+                        <td
                           className={
-                            t.type === "income"
-                              ? "txn-tag txn-tag-income"
-                              : "txn-tag txn-tag-expense"
+                            t.type === "income" ? "text-green" : "text-red"
                           }
                         >
-                          {t.type === "income" ? "Income" : "Expense"}
-                        </span>
-                      </td>
-                      <td
-                        className={
-                          t.type === "income" ? "text-green" : "text-red"
-                        }
-                      >
-                        {t.type === "income" ? "+" : "-"}{" "}
-                        {Number(t.amount).toFixed(2)}
-                      </td>
-                      <td>
-                        <div className="txn-actions">
-                          <button
-                            className="list-action-btn"
-                            type="button"
-                            onClick={() => startEdit(t)}
-                          >
-                            Edit
-                          </button>
-                          <button
-                            className="list-action-btn list-action-btn-danger"
-                            type="button"
-                            onClick={() => handleDelete(t.transaction_id)}
-                          >
-                            Delete
-                          </button>
-                        </div>
-                      </td>
-                    </tr>
-                  ))}
-                </tbody>
-              </table>
+                          {t.type === "income" ? "+" : "-"}{" "}
+                          {Number(t.amount).toFixed(2)}
+                        </td>
+                        <td>
+                          <div className="txn-actions">
+                            <button
+                              className="list-action-btn"
+                              type="button"
+                              onClick={() => startEdit(t)}
+                            >
+                              Edit
+                            </button>
+                            <button
+                              className="list-action-btn list-action-btn-danger"
+                              type="button"
+                              onClick={() => handleDelete(t.transaction_id)}
+                            >
+                              Delete
+                            </button>
+                          </div>
+                        </td>
+                      </tr>
+                    ))}
+                  </tbody>
+                </table>
+                {nextCursor && (
+                  <div className="load-more">
+                    <button
+                      className="list-action-btn"
+                      type="button"
+                      onClick={loadMore}
+                      disabled={isLoadingMore}
+                    >
+                      {isLoadingMore ? "Loading…" : "Load older transactions"}
+                    </button>
+                  </div>
+                )}
+              </>
             ) : (
               <div className="empty-state">
                 <span className="empty-icon">🧾</span>
@@ -418,6 +452,12 @@ export default function TransactionsPage() {
             justify-content: flex-end;
           }
 
+          .load-more {
+            display: flex;
+            justify-content: center;
+            margin-top: 12px;
+          }
+
           .empty-state {
             display: flex;
             flex-direction: column;
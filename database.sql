@@ -156,3 +156,203 @@ ADD COLUMN last_reminder_sent DATE NULL;
 ALTER TABLE Budgets
 ADD COLUMN near_limit_sent TINYINT(1) NOT NULL DEFAULT 0;
 
+
+-- Keyset pagination for GET /transactions (user_id, date DESC, transaction_id DESC)
+CREATE INDEX idx_txn_user_date_id ON Transactions(user_id, date, transaction_id);
+
+-- Server-side filters for GET /transactions
+CREATE INDEX idx_txn_user_type_date ON Transactions(user_id, type, date);
+CREATE INDEX idx_txn_user_cat_date ON Transactions(user_id, category_id, date);
+ALTER TABLE Transactions ADD FULLTEXT INDEX ft_txn_note (note);
+
+-- Per-user running totals behind GET /dashboard (maintained by aggregates.py)
+CREATE TABLE UserSummaries (
+    user_id INT PRIMARY KEY,
+    total_income DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    total_expense DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    transaction_count INT NOT NULL DEFAULT 0,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);
+
+INSERT INTO UserSummaries (user_id, total_income, total_expense, transaction_count)
+SELECT
+    user_id,
+    SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END),
+    SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END),
+    COUNT(*)
+FROM Transactions
+GROUP BY user_id;
+
+-- Monthly rollup of Transactions (maintained by aggregates.py).
+-- category_id 0 = uncategorized, so it can be part of the primary key.
+CREATE TABLE MonthlyRollups (
+    user_id INT NOT NULL,
+    year SMALLINT NOT NULL,
+    month TINYINT NOT NULL,
+    category_id INT NOT NULL DEFAULT 0,
+    type ENUM('income', 'expense') NOT NULL,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    txn_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, year, month, category_id, type),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);
+
+CREATE INDEX idx_rollup_user_cat_type ON MonthlyRollups(user_id, category_id, type);
+
+INSERT INTO MonthlyRollups (user_id, year, month, category_id, type, total, txn_count)
+SELECT user_id, YEAR(date), MONTH(date), COALESCE(category_id, 0), type, SUM(amount), COUNT(*)
+FROM Transactions
+GROUP BY user_id, YEAR(date), MONTH(date), COALESCE(category_id, 0), type;
+
+-- Daily rollup behind /charts/income-expense, plus a per-user write counter
+-- used to invalidate cached chart results
+CREATE TABLE DailyRollups (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    type ENUM('income', 'expense') NOT NULL,
+    total DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+    txn_count INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, type),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);
+
+INSERT INTO DailyRollups (user_id, day, type, total, txn_count)
+SELECT user_id, date, type, SUM(amount), COUNT(*)
+FROM Transactions
+GROUP BY user_id, date, type;
+
+ALTER TABLE UserSummaries
+ADD COLUMN data_version BIGINT NOT NULL DEFAULT 0;
+
+-- The current-month budget alert scan, over shard ranges of user_id
+CREATE INDEX idx_budget_period_user ON Budgets(year, month, user_id);
+
+-- Durable email outbox: jobs enqueue here, the outbox worker delivers
+CREATE TABLE EmailOutbox (
+    email_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    user_id INT NULL,
+    to_email VARCHAR(255) NOT NULL,
+    subject VARCHAR(255) NOT NULL,
+    body TEXT NOT NULL,
+    status ENUM('pending', 'sending', 'sent', 'dead') NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    next_attempt_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    locked_until DATETIME NULL,
+    last_error VARCHAR(500) NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    sent_at DATETIME NULL,
+    INDEX idx_outbox_due (status, next_attempt_at),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);
+
+-- Per-shard progress of the daily reminder / alert sweeps
+CREATE TABLE JobCheckpoints (
+    job_name VARCHAR(64) NOT NULL,
+    run_date DATE NOT NULL,
+    shard_no INT NOT NULL,
+    user_lo INT NOT NULL,
+    user_hi INT NOT NULL,
+    next_user_id INT NOT NULL,
+    status ENUM('pending', 'running', 'done', 'failed') NOT NULL DEFAULT 'pending',
+    processed INT NOT NULL DEFAULT 0,
+    last_error VARCHAR(500) NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    PRIMARY KEY (job_name, run_date, shard_no)
+);
+
+-- Per-user delivery windows for reminders and alerts. next_notify_at (UTC)
+-- is filled in by the scheduler for existing users on its first tick.
+ALTER TABLE Users
+ADD COLUMN timezone VARCHAR(64) NOT NULL DEFAULT 'Asia/Karachi',
+ADD COLUMN notify_hour TINYINT NOT NULL DEFAULT 19,
+ADD COLUMN next_notify_at DATETIME NULL,
+ADD INDEX idx_users_next_notify (next_notify_at);
+
+-- Goal reminder candidates: equality column first, then the deadline range
+-- (InnoDB appends goal_id, which the (deadline, goal_id) keyset relies on)
+CREATE INDEX idx_goal_notify_deadline ON SavingsGoals(notify_enabled, deadline);
+
+-- Read state, keyset paging and unread counts for notifications
+ALTER TABLE Notifications
+ADD COLUMN is_read TINYINT(1) NOT NULL DEFAULT 0;
+
+CREATE INDEX idx_notif_user_created ON Notifications(user_id, created_at, notification_id);
+CREATE INDEX idx_notif_user_unread ON Notifications(user_id, is_read, created_at);
+
+-- Notifications past NOTIFICATION_RETENTION_DAYS are moved here
+CREATE TABLE NotificationsArchive (
+    notification_id INT PRIMARY KEY,
+    user_id INT NOT NULL,
+    goal_id INT NULL,
+    message VARCHAR(255),
+    type ENUM('budget_alert', 'savings_milestone') NOT NULL,
+    is_read TINYINT(1) NOT NULL DEFAULT 0,
+    created_at DATETIME,
+    archived_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_notif_archive_user (user_id, created_at)
+);
+
+-- Rotating refresh tokens: only sha256 of the secret half is stored, looked
+-- up by token_id. A family is one login's chain of rotations.
+CREATE TABLE RefreshTokens (
+    token_id CHAR(32) PRIMARY KEY,
+    family_id CHAR(32) NOT NULL,
+    user_id INT NOT NULL,
+    token_hash CHAR(64) NOT NULL,
+    expires_at DATETIME NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    revoked_at DATETIME NULL,
+    replaced_by CHAR(32) NULL,
+    INDEX idx_refresh_family (family_id),
+    INDEX idx_refresh_user (user_id, revoked_at),
+    INDEX idx_refresh_expires (expires_at),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);
+
+-- Logged-out access tokens, by JWT id, until the token would have expired.
+-- Web processes keep the live rows in memory and sync on revoked_at (UTC).
+CREATE TABLE RevokedTokens (
+    jti CHAR(32) PRIMARY KEY,
+    user_id INT NULL,
+    expires_at DATETIME NOT NULL,
+    revoked_at DATETIME NOT NULL,
+    INDEX idx_revoked_at (revoked_at),
+    INDEX idx_revoked_expires (expires_at)
+);
+
+-- Budget alert emails wait for the user's send window; alert_emailed_level
+-- trails near_limit_sent until then. Alerts sent before this are done.
+ALTER TABLE Budgets
+ADD COLUMN alert_emailed_level TINYINT NOT NULL DEFAULT 0;
+
+UPDATE Budgets SET alert_emailed_level = near_limit_sent;
+
+-- Owner of a running shard, so a new leader can take over a dead one's run
+ALTER TABLE JobCheckpoints
+ADD COLUMN owner VARCHAR(100) NULL;
+
+-- Retention scan: SELECT ... WHERE created_at < cutoff ORDER BY created_at
+CREATE INDEX idx_notif_created ON Notifications(created_at);
+
+-- Every user has a UserSummaries row from signup on; give existing users
+-- without transactions theirs (anyone else is seeded before their next write)
+INSERT IGNORE INTO UserSummaries (user_id)
+SELECT u.user_id
+FROM Users u
+WHERE NOT EXISTS (SELECT 1 FROM Transactions t WHERE t.user_id = u.user_id);
+
+-- Single-use tickets for opening the SSE stream (sha256 of the token only)
+CREATE TABLE StreamTokens (
+    token_hash CHAR(64) PRIMARY KEY,
+    user_id INT NOT NULL,
+    expires_at DATETIME NOT NULL,
+    INDEX idx_stream_expires (expires_at),
+    FOREIGN KEY (user_id) REFERENCES Users(user_id)
+        ON DELETE CASCADE
+);